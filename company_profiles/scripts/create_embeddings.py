@@ -4,76 +4,189 @@ Create Embeddings for Company Profiles
 Uses Ollama for embeddings and stores in ChromaDB
 """
 
+import functools
+import hashlib
 import json
 import os
-import urllib.request
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # read_json/write_json then use json
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None  # Fall back to the NumPy matmul
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PROFILES_DIR = os.path.join(BASE_DIR, 'profiles')
 CHROMA_DIR = os.path.join(BASE_DIR, 'embeddings', 'chroma_db')
+EMBEDDINGS_DIR = os.path.dirname(CHROMA_DIR)
+EMBEDDINGS_NPY = os.path.join(EMBEDDINGS_DIR, 'embeddings.npy')
+EMBEDDINGS_META = os.path.join(EMBEDDINGS_DIR, 'embeddings_meta.json')
+EMBEDDINGS_JSON = os.path.join(EMBEDDINGS_DIR, 'embeddings.json')  # Legacy format
 
-OLLAMA_URL = "http://localhost:11434/api/embeddings"
+OLLAMA_URL = "http://localhost:11434/api/embeddings"  # Legacy single-text endpoint
+OLLAMA_EMBED_URL = "http://localhost:11434/api/embed"  # Batch endpoint
 EMBED_MODEL = "nomic-embed-text"  # Or: mxbai-embed-large, all-minilm
+EMBED_BATCH_SIZE = 32  # 64 works well for GPU Ollama instances
+EMBED_WORKERS = 4
+EMBED_CACHE_SIZE = 4096  # Query embeddings kept in memory
 
+# Shared keep-alive session so batches reuse pooled connections
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=EMBED_WORKERS))
 
-def get_embedding(text: str) -> Optional[List[float]]:
-    """Get embedding vector from Ollama"""
+
+def read_json(path: str):
+    """Read a JSON file, using orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path: str, data) -> None:
+    """Write a JSON file, using orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data))
+        return
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def _post_json(url: str, payload: Dict, timeout: int = 30) -> Dict:
+    """POST a JSON payload to Ollama and return the decoded response"""
+    resp = _session.post(url, json=payload, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def get_embeddings_batch(texts: List[str]) -> Optional[List[List[float]]]:
+    """Get embedding vectors for several texts in one Ollama /api/embed call"""
+    try:
+        result = _post_json(OLLAMA_EMBED_URL, {
+            "model": EMBED_MODEL,
+            "input": texts
+        })
+        embeddings = result.get('embeddings')
+        if embeddings and len(embeddings) == len(texts):
+            return embeddings
+            
+    except Exception as e:
+        print(f"Batch embedding error: {e}")
     
-    payload = json.dumps({
-        "model": EMBED_MODEL,
-        "prompt": text
-    }).encode('utf-8')
+    return None
+
+
+def _fetch_embedding(text: str) -> Optional[List[float]]:
+    """Request a single embedding vector from Ollama"""
+    embeddings = get_embeddings_batch([text])
+    if embeddings:
+        return embeddings[0]
     
+    # Fallback for Ollama versions without /api/embed
     try:
-        req = urllib.request.Request(
-            OLLAMA_URL,
-            data=payload,
-            headers={"Content-Type": "application/json"}
-        )
-        
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            result = json.loads(resp.read().decode('utf-8'))
-            return result.get('embedding')
+        result = _post_json(OLLAMA_URL, {
+            "model": EMBED_MODEL,
+            "prompt": text
+        })
+        return result.get('embedding')
             
     except Exception as e:
         print(f"Embedding error: {e}")
         return None
 
 
+@functools.lru_cache(maxsize=EMBED_CACHE_SIZE)
+def _cached_embedding(text: str) -> Tuple[float, ...]:
+    embedding = _fetch_embedding(text)
+    if not embedding:
+        raise LookupError(text)  # Failures are not cached
+    return tuple(embedding)
+
+
+def get_embedding(text: str) -> Optional[List[float]]:
+    """Get embedding vector from Ollama (cached per text)"""
+    try:
+        return list(_cached_embedding(text))
+    except LookupError:
+        return None
+
+
+def _embed_batch(texts: List[str]) -> List[Optional[List[float]]]:
+    """Embed a batch, falling back to one-by-one requests if the batch call fails"""
+    embeddings = get_embeddings_batch(texts)
+    if embeddings is None:
+        embeddings = [get_embedding(text) for text in texts]
+    return embeddings
+
+
+PROFILE_TEXT_TEMPLATE = '\n'.join([
+    "{ticker} - {name}",
+    "Sector: {sector}",
+    "Summary: {summary}",
+    "Business: {business_model}",
+    "Products: {key_products}",
+    "Competitors: {competitors}",
+    "Position: {market_position}",
+    "Risks: {risks}",
+    "Catalysts: {catalysts}",
+    "Keywords: {sentiment_keywords}"
+])
+
+
+class _ProfileFields(dict):
+    """Template fields for a profile; missing fields render as empty strings"""
+    
+    def __missing__(self, key):
+        return ''
+
+
 def profile_to_text(profile: Dict) -> str:
     """Convert profile to searchable text"""
+    fields = _ProfileFields(
+        (key, ', '.join(value) if isinstance(value, list) else value)
+        for key, value in profile.items()
+    )
+    fields.setdefault('sector', 'unknown')
     
-    parts = [
-        f"{profile['ticker']} - {profile['name']}",
-        f"Sector: {profile.get('sector', 'unknown')}",
-        f"Summary: {profile.get('summary', '')}",
-        f"Business: {profile.get('business_model', '')}",
-        f"Products: {', '.join(profile.get('key_products', []))}",
-        f"Competitors: {', '.join(profile.get('competitors', []))}",
-        f"Position: {profile.get('market_position', '')}",
-        f"Risks: {', '.join(profile.get('risks', []))}",
-        f"Catalysts: {', '.join(profile.get('catalysts', []))}",
-        f"Keywords: {', '.join(profile.get('sentiment_keywords', []))}"
-    ]
+    return PROFILE_TEXT_TEMPLATE.format_map(fields)
+
+
+PROFILE_LOAD_WORKERS = 8
+
+
+def list_profile_paths() -> Dict[str, str]:
+    """Map ticker -> profile file path for all profiles on disk"""
+    if not os.path.exists(PROFILES_DIR):
+        return {}
     
-    return '\n'.join(parts)
+    return {
+        filename[:-5]: os.path.join(PROFILES_DIR, filename)
+        for filename in os.listdir(PROFILES_DIR)
+        if filename.endswith('.json')
+    }
 
 
 def load_all_profiles() -> List[Dict]:
     """Load all profiles from profiles directory"""
-    profiles = []
-    
-    if not os.path.exists(PROFILES_DIR):
-        return profiles
-    
-    for filename in os.listdir(PROFILES_DIR):
-        if filename.endswith('.json'):
-            filepath = os.path.join(PROFILES_DIR, filename)
-            with open(filepath) as f:
-                profiles.append(json.load(f))
+    paths = list(list_profile_paths().values())
+    if not paths:
+        return []
     
-    return profiles
+    # I/O bound: overlap the file reads
+    with ThreadPoolExecutor(max_workers=PROFILE_LOAD_WORKERS) as executor:
+        return list(executor.map(read_json, paths))
 
 
 def create_embeddings_simple() -> Dict:
@@ -90,83 +203,187 @@ def create_embeddings_simple() -> Dict:
     embeddings_data = {
         'model': EMBED_MODEL,
         'created': datetime.now().isoformat(),
-        'documents': []
+        'normalized': True,
+        'tickers': [],
+        'texts': [],
+        'text_hashes': []
     }
+    vectors = []
+    
+    texts = [profile_to_text(profile) for profile in profiles]
+    hashes = [text_hash(text) for text in texts]
+    
+    # Reuse stored vectors for profiles whose text is unchanged
+    known = _existing_embeddings_by_hash()
+    todo = [i for i, h in enumerate(hashes) if h not in known]
+    todo_texts = [texts[i] for i in todo]
+    batches = [todo_texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(todo_texts), EMBED_BATCH_SIZE)]
+    
+    print(f"🔄 Creating embeddings for {len(todo)} of {len(profiles)} profiles "
+          f"in {len(batches)} batches ({len(profiles) - len(todo)} unchanged)...")
+    
+    # Batches run concurrently; map() keeps results in profile order
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as executor:
+        results = executor.map(_embed_batch, batches)
+        fresh = [embedding for batch in results for embedding in batch]
+    
+    embeddings = [known.get(h) for h in hashes]
+    for i, embedding in zip(todo, fresh):
+        embeddings[i] = embedding
     
-    for i, profile in enumerate(profiles):
+    for profile, text, h, embedding in zip(profiles, texts, hashes, embeddings):
         ticker = profile['ticker']
-        text = profile_to_text(profile)
         
-        print(f"🔄 [{i+1}/{len(profiles)}] Creating embedding for {ticker}...")
-        
-        embedding = get_embedding(text)
-        
-        if embedding:
-            embeddings_data['documents'].append({
-                'ticker': ticker,
-                'text': text,
-                'embedding': embedding
-            })
+        if embedding is not None and len(embedding):
+            embeddings_data['tickers'].append(ticker)
+            embeddings_data['texts'].append(text)
+            embeddings_data['text_hashes'].append(h)
+            vectors.append(embedding)
             print(f"✅ {ticker}: {len(embedding)} dimensions")
         else:
             print(f"❌ {ticker}: Failed")
     
-    # Save embeddings
-    os.makedirs(os.path.dirname(CHROMA_DIR), exist_ok=True)
-    embeddings_file = os.path.join(os.path.dirname(CHROMA_DIR), 'embeddings.json')
+    # Save unit-length embeddings as a float32 matrix plus a small JSON sidecar
+    os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
+    np.save(EMBEDDINGS_NPY, normalize_rows(vectors))
     
-    with open(embeddings_file, 'w') as f:
-        json.dump(embeddings_data, f)
+    write_json(EMBEDDINGS_META, embeddings_data)
     
-    print(f"\n✅ Saved {len(embeddings_data['documents'])} embeddings to {embeddings_file}")
+    print(f"\n✅ Saved {len(vectors)} embeddings to {EMBEDDINGS_NPY}")
     return embeddings_data
 
 
-def cosine_similarity(a: List[float], b: List[float]) -> float:
-    """Calculate cosine similarity between two vectors"""
-    dot_product = sum(x * y for x, y in zip(a, b))
-    norm_a = sum(x * x for x in a) ** 0.5
-    norm_b = sum(x * x for x in b) ** 0.5
+def text_hash(text: str) -> str:
+    """Stable hash of a profile text, used to detect unchanged profiles"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _existing_embeddings_by_hash() -> Dict[str, np.ndarray]:
+    """Map text hash -> stored vector from the current embeddings, if any"""
+    meta, matrix = load_embeddings()
+    if meta is None or meta.get('model') != EMBED_MODEL or len(matrix) == 0:
+        return {}
+    
+    hashes = meta.get('text_hashes') or [text_hash(text) for text in meta.get('texts', [])]
+    # Copy rows out of the memory map; the file is rewritten afterwards
+    return {h: np.array(matrix[i]) for i, h in enumerate(hashes)}
+
+
+def load_embeddings() -> Tuple[Optional[Dict], np.ndarray]:
+    """
+    Load embedding metadata and the L2-normalized (N, D) embedding matrix.
+    Normalized matrices are memory-mapped as-is; the legacy embeddings.json
+    and older unnormalized files are normalized on load.
+    """
+    if os.path.exists(EMBEDDINGS_NPY) and os.path.exists(EMBEDDINGS_META):
+        meta = read_json(EMBEDDINGS_META)
+        matrix = np.load(EMBEDDINGS_NPY, mmap_mode='r')
+        if not meta.get('normalized'):
+            matrix = normalize_rows(matrix)
+        return meta, matrix
     
-    if norm_a == 0 or norm_b == 0:
-        return 0
+    if os.path.exists(EMBEDDINGS_JSON):
+        data = read_json(EMBEDDINGS_JSON)
+        documents = data.pop('documents', [])
+        data['tickers'] = [doc['ticker'] for doc in documents]
+        data['texts'] = [doc['text'] for doc in documents]
+        return data, normalize_rows([doc['embedding'] for doc in documents])
     
-    return dot_product / (norm_a * norm_b)
+    return None, np.zeros((0, 0), dtype=np.float32)
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """Return an L2-normalized float32 copy of an (N, D) embedding matrix"""
+    matrix = np.array(matrix, dtype=np.float32)
+    if matrix.size == 0:
+        return matrix
+    
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _dot_scan(matrix, q):
+        """Row-wise dot products, parallel over documents"""
+        out = np.empty(matrix.shape[0], dtype=np.float32)
+        for i in prange(matrix.shape[0]):
+            s = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                s += matrix[i, j] * q[j]
+            out[i] = s
+        return out
+else:
+    _dot_scan = None
+
+
+def similarity_scores(matrix: np.ndarray, query_embedding: List[float]) -> np.ndarray:
+    """Cosine similarity of the query against every row of a normalized matrix"""
+    q = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(q)
+    if norm == 0 or len(matrix) == 0:
+        return np.zeros(len(matrix), dtype=np.float32)
+    q /= norm
+    if _dot_scan is not None:
+        return _dot_scan(matrix, q)
+    return matrix @ q
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first"""
+    if top_k <= 0 or len(scores) == 0:
+        return np.zeros(0, dtype=np.intp)
+    if top_k < len(scores):
+        idx = np.argpartition(-scores, top_k)[:top_k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx])]
+
+
+def pack_signs(matrix: np.ndarray) -> np.ndarray:
+    """Binarize embeddings to one sign bit per dimension (packed uint8 rows)"""
+    return np.packbits(np.asarray(matrix) > 0, axis=-1)
+
+
+def hamming_candidates(bits: np.ndarray, query_embedding: List[float], n: int) -> np.ndarray:
+    """Indices of the n rows of packed sign bits closest to the query in Hamming distance"""
+    diff = np.bitwise_xor(bits, pack_signs(np.asarray(query_embedding)))
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        distances = np.bitwise_count(diff).sum(axis=1, dtype=np.int32)
+    else:
+        distances = np.unpackbits(diff, axis=1).sum(axis=1, dtype=np.int32)
+    
+    if n >= len(distances):
+        return np.arange(len(distances))
+    return np.argpartition(distances, n)[:n]
 
 
 def search_similar(query: str, top_k: int = 3) -> List[Dict]:
     """Search for similar company profiles"""
     
     # Load embeddings
-    embeddings_file = os.path.join(os.path.dirname(CHROMA_DIR), 'embeddings.json')
+    meta, matrix = load_embeddings()
     
-    if not os.path.exists(embeddings_file):
+    if meta is None:
         print("❌ No embeddings found. Run create_embeddings first.")
         return []
     
-    with open(embeddings_file) as f:
-        data = json.load(f)
-    
     # Get query embedding
     query_embedding = get_embedding(query)
     if not query_embedding:
         print("❌ Failed to create query embedding")
         return []
     
-    # Calculate similarities
-    results = []
-    for doc in data['documents']:
-        similarity = cosine_similarity(query_embedding, doc['embedding'])
-        results.append({
-            'ticker': doc['ticker'],
-            'similarity': similarity,
-            'text': doc['text'][:200] + '...'
-        })
-    
-    # Sort by similarity
-    results.sort(key=lambda x: x['similarity'], reverse=True)
+    # Calculate similarities in one matrix-vector product
+    scores = similarity_scores(matrix, query_embedding)
     
-    return results[:top_k]
+    return [{
+        'ticker': meta['tickers'][i],
+        'similarity': float(scores[i]),
+        'text': meta['texts'][i][:200] + '...'
+    } for i in top_k_indices(scores, top_k)]
 
 
 from datetime import datetime
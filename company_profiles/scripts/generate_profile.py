@@ -4,8 +4,10 @@ Generate Company Profile using Ollama
 Creates a structured profile for RAG-enhanced sentiment analysis
 """
 
+import asyncio
 import json
 import os
+import re
 import urllib.request
 from datetime import datetime
 from typing import Dict, Optional
@@ -14,6 +16,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PROFILES_DIR = os.path.join(BASE_DIR, 'profiles')
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL = "llama3.2:3b"
+JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
+MAX_CONCURRENT = 4  # Parallel Ollama generations; keep low so the GPU isn't thrashed
 
 PROFILE_TEMPLATE = """Generate a company profile for {ticker} ({name}) in JSON format.
 
@@ -49,6 +53,7 @@ def generate_profile_with_ollama(ticker: str, name: str, sector: str) -> Optiona
         "model": MODEL,
         "prompt": prompt,
         "stream": False,
+        "format": "json",  # Ollama constrains the output to valid JSON
         "options": {
             "temperature": 0.3,
             "num_predict": 800
@@ -66,20 +71,23 @@ def generate_profile_with_ollama(ticker: str, name: str, sector: str) -> Optiona
             result = json.loads(resp.read().decode('utf-8'))
             response = result.get('response', '')
             
-            # Try to parse JSON from response
-            import re
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
+            try:
+                profile_data = json.loads(response)
+            except json.JSONDecodeError:
+                # Older Ollama versions ignore "format"; extract the JSON object
+                json_match = JSON_OBJECT_RE.search(response)
+                if not json_match:
+                    return None
                 profile_data = json.loads(json_match.group())
-                
-                # Add metadata
-                profile_data['ticker'] = ticker
-                profile_data['name'] = name
-                profile_data['sector'] = sector
-                profile_data['updated'] = datetime.now().isoformat()[:10]
-                profile_data['recent_events'] = []
-                
-                return profile_data
+            
+            # Add metadata
+            profile_data['ticker'] = ticker
+            profile_data['name'] = name
+            profile_data['sector'] = sector
+            profile_data['updated'] = datetime.now().isoformat()[:10]
+            profile_data['recent_events'] = []
+            
+            return profile_data
                 
     except Exception as e:
         print(f"Error generating profile for {ticker}: {e}")
@@ -107,38 +115,66 @@ def load_profile(ticker: str) -> Optional[Dict]:
     return None
 
 
-def generate_all_profiles(sector_assets_path: str, limit: int = None) -> None:
-    """Generate profiles for all companies in sector_assets.json"""
-    
+async def generate_all_profiles_async(sector_assets_path: str, limit: int = None) -> int:
+    """
+    Generate profiles for all companies in sector_assets.json.
+    Up to MAX_CONCURRENT generations run at once; returns the number saved.
+    """
     with open(sector_assets_path) as f:
         data = json.load(f)
     
-    count = 0
+    todo = []
+    seen = set()
     for sector, info in data.get('sectors', {}).items():
         for stock in info.get('stocks', []):
-            ticker = stock['ticker']
-            name = stock['name']
+            # Tickers listed in several sectors are generated once, for their first sector
+            if stock['ticker'] in seen:
+                continue
+            seen.add(stock['ticker'])
             
             # Skip if profile exists
-            if load_profile(ticker):
-                print(f"⏭️  {ticker}: Profile exists, skipping")
+            if load_profile(stock['ticker']):
+                print(f"⏭️  {stock['ticker']}: Profile exists, skipping")
                 continue
+            todo.append((stock['ticker'], stock['name'], sector))
+    
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+    count = 0
+    in_flight = 0
+    
+    async def generate(ticker: str, name: str, sector: str) -> None:
+        nonlocal count, in_flight
+        async with semaphore:
+            # Generations still running may reach the limit; only start one if they can't
+            if limit and count + in_flight >= limit:
+                return
             
             print(f"🔄 Generating profile for {ticker} ({name})...")
-            profile = generate_profile_with_ollama(ticker, name, sector)
+            in_flight += 1
+            try:
+                profile = await asyncio.to_thread(generate_profile_with_ollama, ticker, name, sector)
+            finally:
+                in_flight -= 1
             
-            if profile:
+            if not profile:
+                print(f"❌ {ticker}: Failed to generate")
+            else:
                 filepath = save_profile(profile)
                 print(f"✅ {ticker}: Saved to {filepath}")
                 count += 1
-            else:
-                print(f"❌ {ticker}: Failed to generate")
-            
-            if limit and count >= limit:
-                print(f"\n⏹️  Reached limit of {limit} profiles")
-                return
     
-    print(f"\n✅ Generated {count} new profiles")
+    await asyncio.gather(*(generate(*stock) for stock in todo))
+    
+    if limit and count >= limit:
+        print(f"\n⏹️  Reached limit of {limit} profiles")
+    else:
+        print(f"\n✅ Generated {count} new profiles")
+    return count
+
+
+def generate_all_profiles(sector_assets_path: str, limit: int = None) -> None:
+    """Generate profiles for all companies in sector_assets.json"""
+    asyncio.run(generate_all_profiles_async(sector_assets_path, limit))
 
 
 if __name__ == '__main__':
@@ -4,14 +4,29 @@ RAG Query Module for Sentiment Analysis
 Retrieves relevant company context for news headlines
 """
 
-import json
+import functools
 import os
-from typing import Dict, List, Optional
-from create_embeddings import get_embedding, cosine_similarity
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None  # Fall back to a NumPy brute-force scan
+
+from create_embeddings import (
+    get_embedding, hamming_candidates, list_profile_paths, load_embeddings, pack_signs,
+    read_json, similarity_scores, top_k_indices
+)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-EMBEDDINGS_FILE = os.path.join(BASE_DIR, 'embeddings', 'embeddings.json')
 PROFILES_DIR = os.path.join(BASE_DIR, 'profiles')
+HNSW_MIN_DOCS = 10000  # Below this an exact flat index is fast enough
+QUANTIZE_INT8 = True  # Store 8-bit codes in the HNSW index (4x less memory traffic)
+PROFILE_CACHE_SIZE = 256
+BINARY_PREFILTER_MIN_DOCS = 10000  # Without FAISS, prefilter large corpora on sign bits
+BINARY_OVERSAMPLE = 10  # Candidates rescored per requested result
 
 
 class CompanyRAG:
@@ -19,23 +34,79 @@ class CompanyRAG:
     
     def __init__(self):
         self.embeddings_data = None
-        self.profiles = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.tickers = []
+        self.index = None
+        self.bits = None
+        self._profile_paths = {}
+        self.get_profile = functools.lru_cache(maxsize=PROFILE_CACHE_SIZE)(self._read_profile)
         self._load_data()
+        self._build_index()
+        self._warm_up()
     
     def _load_data(self):
-        """Load embeddings and profiles"""
+        """Load embeddings and index profile files (profiles are read on demand)"""
         # Load embeddings
-        if os.path.exists(EMBEDDINGS_FILE):
-            with open(EMBEDDINGS_FILE) as f:
-                self.embeddings_data = json.load(f)
-        
-        # Load profiles
-        if os.path.exists(PROFILES_DIR):
-            for filename in os.listdir(PROFILES_DIR):
-                if filename.endswith('.json'):
-                    ticker = filename[:-5]
-                    with open(os.path.join(PROFILES_DIR, filename)) as f:
-                        self.profiles[ticker] = json.load(f)
+        meta, matrix = load_embeddings()
+        if meta is not None:
+            self.embeddings_data = meta
+            self.matrix = matrix
+            self.tickers = meta.get('tickers', [])
+        
+        self._profile_paths = list_profile_paths()
+    
+    def _read_profile(self, ticker: str) -> Dict:
+        """Read a single profile from disk; empty dict if there is none"""
+        path = self._profile_paths.get(ticker)
+        if path is None:
+            return {}
+        return read_json(path)
+    
+    def _build_index(self):
+        """Build a FAISS inner-product index over the normalized embeddings"""
+        if faiss is None:
+            if len(self.matrix) >= BINARY_PREFILTER_MIN_DOCS:
+                self.bits = pack_signs(self.matrix)
+            return
+        if len(self.matrix) == 0:
+            return
+        
+        dim = self.matrix.shape[1]
+        if len(self.matrix) < HNSW_MIN_DOCS:
+            self.index = faiss.IndexFlatIP(dim)
+        elif QUANTIZE_INT8:
+            self.index = faiss.IndexHNSWSQ(
+                dim, faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT
+            )
+            self.index.hnsw.efConstruction = 200
+            self.index.train(self.matrix)
+        else:
+            self.index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efConstruction = 200
+        self.index.add(self.matrix)
+    
+    def _warm_up(self):
+        """Run one throwaway search so the first real query skips cold-start costs"""
+        if len(self.matrix) == 0:
+            return
+        self._search(np.ones(self.matrix.shape[1], dtype=np.float32), 1)
+    
+    def _search(self, query_embedding: List[float], top_k: int) -> List[Tuple[int, float]]:
+        """Return (document index, similarity) pairs for the top_k matches"""
+        if self.index is None and self.bits is not None:
+            # Hamming prefilter, then exact rescoring of the survivors
+            candidates = hamming_candidates(self.bits, query_embedding, BINARY_OVERSAMPLE * top_k)
+            scores = similarity_scores(self.matrix[candidates], query_embedding)
+            return [(int(candidates[i]), float(scores[i])) for i in top_k_indices(scores, top_k)]
+        
+        if self.index is None:
+            scores = similarity_scores(self.matrix, query_embedding)
+            return [(int(i), float(scores[i])) for i in top_k_indices(scores, top_k)]
+        
+        q = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(q)
+        scores, indices = self.index.search(q, top_k)
+        return [(int(i), float(score)) for i, score in zip(indices[0], scores[0]) if i >= 0]
     
     def get_relevant_context(self, headline: str, top_k: int = 2) -> List[Dict]:
         """
@@ -58,12 +129,10 @@ class CompanyRAG:
         
         # Find similar companies
         results = []
-        for doc in self.embeddings_data.get('documents', []):
-            similarity = cosine_similarity(query_embedding, doc['embedding'])
-            
+        for i, similarity in self._search(query_embedding, top_k):
             if similarity > 0.3:  # Minimum threshold
-                ticker = doc['ticker']
-                profile = self.profiles.get(ticker, {})
+                ticker = self.tickers[i]
+                profile = self.get_profile(ticker)
                 
                 results.append({
                     'ticker': ticker,
@@ -75,23 +144,23 @@ class CompanyRAG:
                     'sentiment_keywords': profile.get('sentiment_keywords', [])
                 })
         
-        # Sort by similarity
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        return results[:top_k]
+        return results
     
-    def enrich_sentiment_prompt(self, headline: str, sector: str = None) -> str:
+    def enrich_sentiment_prompt(self, headline: str, sector: str = None,
+                                context: Optional[List[Dict]] = None) -> str:
         """
         Create an enriched prompt for sentiment analysis with company context.
         
         Args:
             headline: News headline
             sector: Optional sector filter
+            context: Precomputed get_relevant_context() result, if available
             
         Returns:
             Enriched context string to add to sentiment prompt
         """
-        context = self.get_relevant_context(headline)
+        if context is None:
+            context = self.get_relevant_context(headline)
         
         if not context:
             return ""
@@ -115,22 +184,28 @@ class CompanyRAG:
         Returns headline with enriched context for sentiment analysis.
         """
         context = self.get_relevant_context(headline)
-        enriched_prompt = self.enrich_sentiment_prompt(headline)
+        enriched_prompt = self.enrich_sentiment_prompt(headline, context=context)
         
         return {
             'headline': headline,
             'relevant_companies': [c['ticker'] for c in context],
             'context': enriched_prompt,
             'suggested_sectors': list(set(
-                self.profiles.get(c['ticker'], {}).get('sector', '') 
+                self.get_profile(c['ticker']).get('sector', '') 
                 for c in context
             ))
         }
 
 
+@functools.lru_cache(maxsize=1)
+def get_rag() -> CompanyRAG:
+    """Shared CompanyRAG instance; build it once per process instead of per request"""
+    return CompanyRAG()
+
+
 def demo():
     """Demo the RAG system"""
-    rag = CompanyRAG()
+    rag = get_rag()
     
     test_headlines = [
         "NVIDIA announces record Q4 earnings driven by AI chip demand",
@@ -6,11 +6,25 @@ Trains the model every day by comparing yesterday's sentiment with today's price
 Now includes PROMPT EVOLUTION - sector prompts are updated based on performance!
 """
 
+import copy
+import heapq
 import json
 import os
+from collections import defaultdict
 from datetime import datetime, timedelta
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # The learning model and history then go through json
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LEARNING_HISTORY_FILE = os.path.join(BASE_DIR, 'data', 'learning_history.jsonl')
+
+# Unseeded RNG for simulated price moves (only used when no real prices are passed in)
+_RNG = np.random.default_rng()
 
 # Import prompt evolution for tracking and updating prompts
 try:
@@ -26,18 +40,75 @@ except ImportError:
     HAS_PROMPT_EVOLUTION = False
     print("⚠️ Prompt evolution not available")
 
-def load_json(filename):
+# Parsed JSON per path, keyed on (mtime, size) so a rewritten file is re-read
+_JSON_CACHE = {}
+
+def load_json(filename, readonly=False):
+    """
+    Load data/<filename>, reusing the parsed result while the file is unchanged.
+    Returns a deep copy unless readonly=True (then the caller must not mutate it).
+    """
     path = os.path.join(BASE_DIR, 'data', filename)
-    if os.path.exists(path):
-        with open(path) as f:
-            return json.load(f)
-    return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _JSON_CACHE.get(path)
+    if hit is not None and hit[0] == key:
+        data = hit[1]
+    else:
+        if orjson is not None:
+            with open(path, 'rb') as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(path) as f:
+                data = json.load(f)
+        _JSON_CACHE[path] = (key, data)
+    
+    return data if readonly else copy.deepcopy(data)
 
 def save_json(data, filename):
     path = os.path.join(BASE_DIR, 'data', filename)
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=2)
+    # Write to a temp file and swap it in so a crash never leaves a truncated file
+    tmp = path + '.tmp'
+    if orjson is not None:
+        with open(tmp, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def append_learning_history(entries):
+    """Append learning entries to data/learning_history.jsonl, one JSON object per line"""
+    os.makedirs(os.path.dirname(LEARNING_HISTORY_FILE), exist_ok=True)
+    if orjson is not None:
+        payload = b''.join(orjson.dumps(entry) + b'\n' for entry in entries)
+    else:
+        payload = ''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8')
+    with open(LEARNING_HISTORY_FILE, 'ab') as f:
+        f.write(payload)
+
+def load_last_learning_entry():
+    """Read only the last line of the learning history, seeking back from EOF"""
+    if not os.path.exists(LEARNING_HISTORY_FILE):
+        return None
+    
+    with open(LEARNING_HISTORY_FILE, 'rb') as f:
+        pos = f.seek(0, os.SEEK_END)
+        data = b''
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+            lines = data.rstrip(b'\n').rsplit(b'\n', 1)
+            if len(lines) == 2 or pos == 0:
+                return json.loads(lines[-1]) if lines[-1].strip() else None
+    return None
 
 def get_sector_etf_prices():
     """
@@ -48,31 +119,59 @@ def get_sector_etf_prices():
     # For now, return placeholder that will be replaced
     return None
 
+def _band(x, flat):
+    """
+    Bucket a move into -2..2: +-2 beyond the flat band, +-1 inside it, 0 when exactly zero.
+    The source-reliability predicate depends only on these buckets.
+    """
+    if x >= flat:
+        return 2
+    if x <= -flat:
+        return -2
+    return 1 if x > 0 else (-1 if x < 0 else 0)
+
+# (headline band, outcome band) pairs that count as a correct call: same direction,
+# or a neutral headline (|s| < 0.1) on a flat day (|a| < 0.5)
+_HIT_PAIRS = frozenset(
+    (h, o) for h in range(-2, 3) for o in range(-2, 3)
+    if (h != 0 and (h > 0) == (o > 0) and o != 0) or (abs(h) < 2 and abs(o) < 2)
+)
+
 def calculate_source_reliability(headlines, actual_outcomes):
     """Calculate which news sources predicted correctly"""
-    source_scores = {}
+    outcomes = {sector: _band(actual, 0.5) for sector, actual in actual_outcomes.items()}
+    counts = defaultdict(lambda: [0, 0])  # source -> [correct, total]
     
     for headline in headlines:
-        source = headline.get('source', 'unknown')
-        sentiment = headline.get('sentiment', 0)
-        sectors = headline.get('sectors', [])
+        sent_band = _band(headline.get('sentiment', 0), 0.1)
+        counter = None
         
-        for sector in sectors:
-            if sector in actual_outcomes:
-                actual = actual_outcomes[sector]
-                # Did this headline's sentiment match the outcome?
-                correct = (sentiment > 0 and actual > 0) or \
-                         (sentiment < 0 and actual < 0) or \
-                         (abs(sentiment) < 0.1 and abs(actual) < 0.5)
-                
-                if source not in source_scores:
-                    source_scores[source] = {'correct': 0, 'total': 0}
-                
-                source_scores[source]['total'] += 1
-                if correct:
-                    source_scores[source]['correct'] += 1
-    
-    return source_scores
+        for sector in headline.get('sectors', []):
+            outcome = outcomes.get(sector)
+            if outcome is None:
+                continue
+            if counter is None:
+                counter = counts[headline.get('source', 'unknown')]
+            
+            # Did this headline's sentiment match the outcome?
+            counter[1] += 1
+            if (sent_band, outcome) in _HIT_PAIRS:
+                counter[0] += 1
+    
+    return {source: {'correct': c, 'total': n} for source, (c, n) in counts.items()}
+
+def source_weight(counts):
+    """
+    Reliability weight of a news source from its accumulated hit counts
+    {'c': correct, 'n': seen}: the Beta(1,1) posterior mean (c+1)/(n+2).
+    """
+    return (counts['c'] + 1) / (counts['n'] + 2)
+
+def _migrate_source_weight(old_weight):
+    """Seed hit counts from a legacy float weight (worth 10 observations)"""
+    if old_weight is None:
+        return {'c': 0, 'n': 0}
+    return {'c': int(old_weight * 10), 'n': 10}
 
 def daily_learn(price_changes=None):
     """
@@ -82,12 +181,14 @@ def daily_learn(price_changes=None):
     3. Adjust sector sensitivity multipliers
     4. Log what was learned
     """
-    print(f"🧠 Daily Learning - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    now = datetime.now()
+    now_iso = now.isoformat()
+    print(f"🧠 Daily Learning - {now.strftime('%Y-%m-%d %H:%M')}")
     print("=" * 60)
     
     # Load model and latest sentiment
     model = load_json('learning_model_v2.json')
-    sentiment = load_json('latest_harvest.json')
+    sentiment = load_json('latest_harvest.json', readonly=True)
     
     if not model:
         print("❌ No model found!")
@@ -102,12 +203,11 @@ def daily_learn(price_changes=None):
         print("⚠️ No real price data - using sentiment-based simulation for learning")
         # Simulate based on general market behavior
         # In production, this would fetch real ETF prices
-        import random
         sectors = ['XLK', 'XLV', 'XLF', 'XLY', 'XLP', 'XLE', 'ICLN', 'XLI', 'XLB', 'XLU', 'XLRE', 'XLC', 'CRYPTO']
-        price_changes = {s: random.uniform(-2, 2) for s in sectors}
+        price_changes = dict(zip(sectors, _RNG.uniform(-2.0, 2.0, size=len(sectors)).tolist()))
     
     learning_entry = {
-        'date': datetime.now().isoformat(),
+        'date': now_iso,
         'type': 'daily',
         'predictions': {},
         'outcomes': {},
@@ -122,65 +222,55 @@ def daily_learn(price_changes=None):
     # === LEARN FROM SECTOR PREDICTIONS ===
     print("\n📊 Sector Learning:")
     
-    correct_count = 0
-    total_count = 0
-    
-    for sector, sent_data in sector_sentiment.items():
-        if sector not in price_changes:
-            continue
-            
-        predicted = sent_data.get('score', 0)
-        actual = price_changes.get(sector, 0)
-        
-        learning_entry['predictions'][sector] = predicted
-        learning_entry['outcomes'][sector] = actual
+    sectors = [s for s in sector_sentiment if s in price_changes]
+    predicted = np.fromiter((sector_sentiment[s].get('score', 0) for s in sectors),
+                            dtype=float, count=len(sectors))
+    actual = np.fromiter((price_changes[s] for s in sectors), dtype=float, count=len(sectors))
+    
+    # Determine which predictions were correct
+    bullish = (predicted > 0.1) & (actual > 0)
+    bearish = (predicted < -0.1) & (actual < 0)
+    neutral = (np.abs(predicted) <= 0.1) & (np.abs(actual) <= 1)
+    correct_mask = bullish | bearish | neutral
+    results = np.select([bullish, bearish, neutral],
+                        ["✓ Bullish correct", "✓ Bearish correct", "✓ Neutral correct"],
+                        default="✗ Wrong")
+    
+    # Update sector sensitivity: +2% trust when correct, -2% when wrong
+    sens_list = [model['sector_sensitivity'].get(s, {
+        'sentiment_multiplier': 1.0,
+        'correct_predictions': 0,
+        'total_predictions': 0
+    }) for s in sectors]
+    old_mult = np.fromiter((sens.get('sentiment_multiplier', 1.0) for sens in sens_list),
+                           dtype=float, count=len(sectors))
+    new_mult = np.clip(old_mult * np.where(correct_mask, 1.02, 0.98), 0.5, 2.0)
+    
+    total_count = len(sectors)
+    correct_count = int(correct_mask.sum())
+    
+    for i, (sector, sens) in enumerate(zip(sectors, sens_list)):
+        correct = bool(correct_mask[i])
         
-        # Determine if prediction was correct
-        if predicted > 0.1 and actual > 0:
-            correct = True
-            result = "✓ Bullish correct"
-        elif predicted < -0.1 and actual < 0:
-            correct = True
-            result = "✓ Bearish correct"
-        elif abs(predicted) <= 0.1 and abs(actual) <= 1:
-            correct = True
-            result = "✓ Neutral correct"
-        else:
-            correct = False
-            result = "✗ Wrong"
-        
-        total_count += 1
-        if correct:
-            correct_count += 1
+        learning_entry['predictions'][sector] = float(predicted[i])
+        learning_entry['outcomes'][sector] = float(actual[i])
         
         # Track prediction for prompt evolution
         if HAS_PROMPT_EVOLUTION:
             record_prediction(sector, correct)
         
-        # Update sector sensitivity
-        sens = model['sector_sensitivity'].get(sector, {
-            'sentiment_multiplier': 1.0,
-            'correct_predictions': 0,
-            'total_predictions': 0
-        })
-        
         sens['total_predictions'] = sens.get('total_predictions', 0) + 1
-        
         if correct:
             sens['correct_predictions'] = sens.get('correct_predictions', 0) + 1
-            # Increase trust
-            old_mult = sens.get('sentiment_multiplier', 1.0)
-            sens['sentiment_multiplier'] = min(2.0, old_mult * 1.02)
-            learning_entry['sector_updates'][sector] = f"multiplier {old_mult:.2f} → {sens['sentiment_multiplier']:.2f} (+2%)"
-        else:
-            # Decrease trust
-            old_mult = sens.get('sentiment_multiplier', 1.0)
-            sens['sentiment_multiplier'] = max(0.5, old_mult * 0.98)
-            learning_entry['sector_updates'][sector] = f"multiplier {old_mult:.2f} → {sens['sentiment_multiplier']:.2f} (-2%)"
+        sens['sentiment_multiplier'] = float(new_mult[i])
+        learning_entry['sector_updates'][sector] = (
+            f"multiplier {old_mult[i]:.2f} → {new_mult[i]:.2f} ({'+' if correct else '-'}2%)"
+        )
         
         model['sector_sensitivity'][sector] = sens
-        
-        print(f"  {sector:6} | Predicted: {predicted:+.2f} | Actual: {actual:+.1f}% | {result}")
+    
+    for i, sector in enumerate(sectors):
+        print(f"  {sector:6} | Predicted: {predicted[i]:+.2f} | Actual: {actual[i]:+.1f}% | {results[i]}")
     
     accuracy = (correct_count / total_count * 100) if total_count > 0 else 0
     print(f"\n  Daily Accuracy: {correct_count}/{total_count} = {accuracy:.0f}%")
@@ -190,18 +280,22 @@ def daily_learn(price_changes=None):
     
     source_scores = calculate_source_reliability(headlines, price_changes)
     
-    for source, scores in sorted(source_scores.items(), key=lambda x: x[1]['total'], reverse=True)[:10]:
+    source_weights = model.setdefault('source_weights', {})
+    # Convert every legacy float weight at once, so the model never mixes both forms
+    for source, counts in source_weights.items():
+        if not isinstance(counts, dict):
+            source_weights[source] = _migrate_source_weight(counts)
+    
+    for source, scores in heapq.nlargest(10, source_scores.items(), key=lambda x: x[1]['total']):
         if scores['total'] >= 3:  # Only update if enough data
             reliability = scores['correct'] / scores['total']
             
-            # Update source weight in model
-            if 'source_weights' not in model:
-                model['source_weights'] = {}
-            
-            old_weight = model['source_weights'].get(source, 1.0)
-            # Move towards actual reliability
-            new_weight = old_weight * 0.9 + reliability * 0.1
-            model['source_weights'][source] = new_weight
+            # Accumulate evidence for this source and derive its weight
+            counts = source_weights.get(source) or _migrate_source_weight(None)
+            counts['c'] += scores['correct']
+            counts['n'] += scores['total']
+            source_weights[source] = counts
+            new_weight = source_weight(counts)
             
             learning_entry['source_updates'][source] = {
                 'correct': scores['correct'],
@@ -221,25 +315,23 @@ def daily_learn(price_changes=None):
         f"Sources updated: {len(learning_entry['source_updates'])}"
     ]
     
-    # Save learning to history
-    if 'learning_history' not in model:
-        model['learning_history'] = []
-    model['learning_history'].append(learning_entry)
-    
-    # Keep only last 90 days of history
-    model['learning_history'] = model['learning_history'][-90:]
+    # Learning goes to the append-only history log; older models kept it inline
+    history_entries = model.pop('learning_history', []) + [learning_entry]
     
     # Update model timestamp
-    model['last_updated'] = datetime.now().isoformat()
-    model['last_learning'] = datetime.now().isoformat()
+    model['last_updated'] = now_iso
+    model['last_learning'] = now_iso
     
     # Calculate overall model stats
-    all_correct = sum(s.get('correct_predictions', 0) for s in model['sector_sensitivity'].values())
-    all_total = sum(s.get('total_predictions', 0) for s in model['sector_sensitivity'].values())
+    all_correct = all_total = 0
+    for s in model['sector_sensitivity'].values():
+        all_correct += s.get('correct_predictions', 0)
+        all_total += s.get('total_predictions', 0)
     model['overall_accuracy'] = (all_correct / all_total * 100) if all_total > 0 else 0
     
-    # Save model
+    # Save model, then the history, so a crash in between can't append the inline entries twice
     save_json(model, 'learning_model_v2.json')
+    append_learning_history(history_entries)
     
     print(f"\n✅ Model updated!")
     print(f"   Overall accuracy: {model['overall_accuracy']:.1f}%")
@@ -261,7 +353,7 @@ def daily_learn(price_changes=None):
 
 def generate_learning_report():
     """Generate a report of what the model learned today"""
-    model = load_json('learning_model_v2.json')
+    model = load_json('learning_model_v2.json', readonly=True)
     
     if not model:
         return "❌ Geen model data"
@@ -271,9 +363,10 @@ def generate_learning_report():
     lines.append("")
     
     # Recent learning
-    history = model.get('learning_history', [])
-    if history:
-        latest = history[-1]
+    latest = load_last_learning_entry()
+    if latest is None and model.get('learning_history'):
+        latest = model['learning_history'][-1]
+    if latest:
         lines.append(f"*Laatste training:* {latest.get('date', 'onbekend')[:10]}")
         
         for item in latest.get('summary', []):
@@ -293,12 +386,12 @@ def generate_learning_report():
     
     # Best/worst sectors
     sens = model.get('sector_sensitivity', {})
-    sorted_sens = sorted(sens.items(), key=lambda x: x[1].get('sentiment_multiplier', 1), reverse=True)
+    top_sens = heapq.nlargest(3, sens.items(), key=lambda x: x[1].get('sentiment_multiplier', 1))
     
-    if sorted_sens:
+    if top_sens:
         lines.append("")
         lines.append("*Meest betrouwbare sectoren:*")
-        for sector, data in sorted_sens[:3]:
+        for sector, data in top_sens:
             mult = data.get('sentiment_multiplier', 1)
             lines.append(f"  🟢 {sector}: {mult:.2f}x")
     
@@ -13,13 +13,90 @@ Outputs improvement proposals to be reviewed.
 
 import json
 import os
+import re
 from datetime import datetime, timedelta
 
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Decision logs and prompt payloads then use json
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 REFLECTIONS_FILE = os.path.join(DATA_DIR, "daily_reflections.jsonl")
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_KEEP_ALIVE = "30m"  # Keep the model loaded between reflection calls
+
+REFLECTION_PROMPT = """You are a trading AI doing end-of-day self-reflection. Analyze your performance and suggest concrete improvements.
+
+TODAY'S SUMMARY ({date}):
+- Decisions: {decisions_summary}
+- Learning: {learning_summary}  
+- Issues: {errors_summary}
+
+DECISION DETAILS:
+{decision_details}
+
+REFLECT ON:
+1. What patterns do you see in today's decisions?
+2. Were confidence levels appropriate?
+3. Any blind spots or biases detected?
+4. What would you do differently tomorrow?
+
+OUTPUT FORMAT (be specific and actionable):
+## Today's Assessment
+[1-2 sentences on overall performance]
+
+## What Worked
+- [specific thing that worked]
+
+## What Could Improve  
+- [specific improvement with concrete action]
+
+## Tomorrow's Focus
+- [one specific thing to focus on]
+
+## Self-Improvement Suggestion
+[One concrete change to prompts, thresholds, or strategy]"""
+
+
+# Substring triggers for extract_suggestions; the lookahead lets overlapping
+# triggers (e.g. "too low" inside "too lower") all be found
+SUGGESTION_TRIGGERS = re.compile(
+    r'(?=(confidence|lower|too high|higher|too low|prompt|diversi|sector|missing|add))',
+    re.IGNORECASE
+)
+
+# JSONL lines are parsed straight from bytes; both parsers accept the trailing newline
+_loads = orjson.loads if orjson is not None else json.loads
+
+# Shared session so repeated calls reuse the keep-alive connection
+_SESSION = requests.Session()
+
+
+def _read_day_entries(path, day, match):
+    """
+    Parse the lines of a JSONL log that belong to `day`.
+    Lines that don't contain the date string at all are skipped with a
+    byte-level substring check before any JSON parsing; match() does the
+    exact check on the parsed record.
+    """
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    
+    needle = day.encode("utf-8")
+    with open(path, 'rb') as f:
+        for line in f:
+            if needle not in line:
+                continue
+            d = _loads(line)
+            if match(d):
+                entries.append(d)
+    return entries
 
 
 def load_today_data():
@@ -33,53 +110,46 @@ def load_today_data():
     }
     
     # Load Phase 2 decisions
-    decisions_file = os.path.join(DATA_DIR, "phase2_decisions.jsonl")
-    if os.path.exists(decisions_file):
-        with open(decisions_file, 'r') as f:
-            for line in f:
-                if line.strip():
-                    d = json.loads(line)
-                    if d.get("date") == today:
-                        data["decisions"].append(d)
+    data["decisions"] = _read_day_entries(
+        os.path.join(DATA_DIR, "phase2_decisions.jsonl"), today,
+        lambda d: d.get("date") == today
+    )
     
     # Load learning log
-    learning_file = os.path.join(DATA_DIR, "nightly_learning_log.jsonl")
-    if os.path.exists(learning_file):
-        with open(learning_file, 'r') as f:
-            for line in f:
-                if line.strip():
-                    d = json.loads(line)
-                    if d.get("timestamp", "").startswith(today):
-                        data["learning"].append(d)
+    data["learning"] = _read_day_entries(
+        os.path.join(DATA_DIR, "nightly_learning_log.jsonl"), today,
+        lambda d: d.get("timestamp", "").startswith(today)
+    )
     
     # Load refined strategy log for errors/patterns
-    strategy_file = os.path.join(DATA_DIR, "refined_strategy_log.jsonl")
-    if os.path.exists(strategy_file):
-        with open(strategy_file, 'r') as f:
-            for line in f:
-                if line.strip():
-                    d = json.loads(line)
-                    if d.get("timestamp", "").startswith(today):
-                        if d.get("error") or d.get("action") == "keep":
-                            data["errors"].append(d)
+    data["errors"] = _read_day_entries(
+        os.path.join(DATA_DIR, "refined_strategy_log.jsonl"), today,
+        lambda d: d.get("timestamp", "").startswith(today)
+                  and (d.get("error") or d.get("action") == "keep")
+    )
     
     return data
 
 
+def _dumps_compact(obj):
+    """Compact JSON for prompts; whitespace only costs the LLM extra tokens."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"))
+
+
 def ollama_reflect(prompt, timeout=120):
     """Use Ollama to generate reflection."""
-    import urllib.request
     try:
-        payload = json.dumps({
+        resp = _SESSION.post(OLLAMA_URL, json={
             "model": "llama3.2:3b",
             "prompt": prompt,
             "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
             "options": {"temperature": 0.7, "num_predict": 800}
-        }).encode("utf-8")
-        req = urllib.request.Request(OLLAMA_URL, data=payload, 
-                                      headers={"Content-Type": "application/json"})
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode("utf-8")).get("response", "")
+        }, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json().get("response", "")
     except Exception as e:
         return f"Reflection error: {e}"
 
@@ -102,37 +172,18 @@ def generate_reflection():
     learning_summary = f"{len(today_data['learning'])} learning events"
     errors_summary = f"{len(today_data['errors'])} potential issues"
     
-    prompt = f"""You are a trading AI doing end-of-day self-reflection. Analyze your performance and suggest concrete improvements.
-
-TODAY'S SUMMARY ({today_data['date']}):
-- Decisions: {decisions_summary}
-- Learning: {learning_summary}  
-- Issues: {errors_summary}
-
-DECISION DETAILS:
-{json.dumps(today_data['decisions'][:5], indent=2) if today_data['decisions'] else 'No decisions today'}
-
-REFLECT ON:
-1. What patterns do you see in today's decisions?
-2. Were confidence levels appropriate?
-3. Any blind spots or biases detected?
-4. What would you do differently tomorrow?
-
-OUTPUT FORMAT (be specific and actionable):
-## Today's Assessment
-[1-2 sentences on overall performance]
-
-## What Worked
-- [specific thing that worked]
-
-## What Could Improve  
-- [specific improvement with concrete action]
-
-## Tomorrow's Focus
-- [one specific thing to focus on]
-
-## Self-Improvement Suggestion
-[One concrete change to prompts, thresholds, or strategy]"""
+    if today_data['decisions']:
+        decision_details = _dumps_compact(today_data['decisions'][:5])
+    else:
+        decision_details = 'No decisions today'
+    
+    prompt = REFLECTION_PROMPT.format(
+        date=today_data['date'],
+        decisions_summary=decisions_summary,
+        learning_summary=learning_summary,
+        errors_summary=errors_summary,
+        decision_details=decision_details
+    )
 
     reflection = ollama_reflect(prompt)
     
@@ -158,25 +209,44 @@ def extract_suggestions(reflection_text):
     """Extract actionable suggestions from reflection."""
     suggestions = []
     
+    # All trigger words present in the text, found in one pass
+    hits = {m.group(1).lower() for m in SUGGESTION_TRIGGERS.finditer(reflection_text)}
+    
     # Look for specific patterns
-    if "confidence" in reflection_text.lower():
-        if "lower" in reflection_text.lower() or "too high" in reflection_text.lower():
+    if "confidence" in hits:
+        if "lower" in hits or "too high" in hits:
             suggestions.append({"type": "threshold", "action": "review confidence threshold"})
-        if "higher" in reflection_text.lower() or "too low" in reflection_text.lower():
+        if "higher" in hits or "too low" in hits:
             suggestions.append({"type": "threshold", "action": "may need more aggressive threshold"})
     
-    if "prompt" in reflection_text.lower():
+    if "prompt" in hits:
         suggestions.append({"type": "prompt", "action": "review and update prompts"})
     
-    if "diversi" in reflection_text.lower():
+    if "diversi" in hits:
         suggestions.append({"type": "strategy", "action": "review diversification"})
     
-    if "sector" in reflection_text.lower() and ("missing" in reflection_text.lower() or "add" in reflection_text.lower()):
+    if "sector" in hits and ("missing" in hits or "add" in hits):
         suggestions.append({"type": "expansion", "action": "consider adding sectors"})
     
     return suggestions
 
 
+def _read_lines_reversed(path, block_size=8192):
+    """Yield the lines of a file from last to first, reading backwards in blocks."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + tail).split(b"\n")
+            tail = lines.pop(0)  # May be incomplete; joined with the next block
+            yield from reversed(lines)
+        yield tail
+
+
 def get_recent_reflections(days=7):
     """Get recent reflections."""
     if not os.path.exists(REFLECTIONS_FILE):
@@ -185,13 +255,16 @@ def get_recent_reflections(days=7):
     cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
     reflections = []
     
-    with open(REFLECTIONS_FILE, 'r') as f:
-        for line in f:
-            if line.strip():
-                r = json.loads(line)
-                if r.get("date", "") >= cutoff:
-                    reflections.append(r)
+    # The file is appended chronologically: read from the end, stop at the cutoff
+    for line in _read_lines_reversed(REFLECTIONS_FILE):
+        if not line.strip():
+            continue
+        r = _loads(line)
+        if r.get("date", "") < cutoff:
+            break
+        reflections.append(r)
     
+    reflections.reverse()
     return reflections
 
 
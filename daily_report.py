@@ -4,45 +4,76 @@ Daily Sentiment Report Generator
 Generates easy-to-understand daily reports
 """
 
+import heapq
 import json
 import os
+from bisect import bisect_left
 from datetime import datetime
+from statistics import fmean
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Report inputs are then parsed with json
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def load_json(filename):
     path = os.path.join(BASE_DIR, 'data', filename)
     if os.path.exists(path):
+        if orjson is not None:
+            with open(path, 'rb') as f:
+                return orjson.loads(f.read())
         with open(path) as f:
             return json.load(f)
     return None
 
+SECTOR_NAMES = {
+    'XLK': 'Technology', 'XLV': 'Healthcare', 'XLF': 'Financials',
+    'XLY': 'Consumer Discr.', 'XLP': 'Consumer Staples', 'XLE': 'Energy',
+    'ICLN': 'Clean Energy', 'XLI': 'Industrials', 'XLB': 'Materials',
+    'XLU': 'Utilities', 'XLRE': 'Real Estate', 'XLC': 'Communication',
+    'CRYPTO': 'Crypto', 'general': 'Algemeen'
+}
+
+# Upper bounds (inclusive) of each score band, ascending, and their labels
+SCORE_THRESHOLDS = (-0.4, -0.2, -0.05, 0.05, 0.2, 0.4)
+SCORE_LABELS = (
+    "🔴⚠️ Zeer negatief - verkoopsignaal",
+    "🔴 Negatief - bearish sentiment",
+    "🔴 Licht negatief",
+    "🟡 Neutraal - afwachten",
+    "🟢 Licht positief",
+    "🟢 Positief - bullish sentiment",
+    "🟢🔥 Zeer positief - sterk koopsignaal",
+)
+
+# Per-sector entry in the top/bottom rankings; filled via str.format_map
+SECTOR_ENTRY = (
+    "{rank}. **{name}** ({sector})\n"
+    "   Score: {score:+.2f} | {count} artikelen\n"
+    "   → {interpretation}"
+)
+
 def get_sector_name(code):
-    names = {
-        'XLK': 'Technology', 'XLV': 'Healthcare', 'XLF': 'Financials',
-        'XLY': 'Consumer Discr.', 'XLP': 'Consumer Staples', 'XLE': 'Energy',
-        'ICLN': 'Clean Energy', 'XLI': 'Industrials', 'XLB': 'Materials',
-        'XLU': 'Utilities', 'XLRE': 'Real Estate', 'XLC': 'Communication',
-        'CRYPTO': 'Crypto', 'general': 'Algemeen'
-    }
-    return names.get(code, code)
+    return SECTOR_NAMES.get(code, code)
 
 def interpret_score(score):
     """Human-readable interpretation of sentiment score"""
-    if score > 0.4:
-        return "🟢🔥 Zeer positief - sterk koopsignaal"
-    elif score > 0.2:
-        return "🟢 Positief - bullish sentiment"
-    elif score > 0.05:
-        return "🟢 Licht positief"
-    elif score > -0.05:
-        return "🟡 Neutraal - afwachten"
-    elif score > -0.2:
-        return "🔴 Licht negatief"
-    elif score > -0.4:
-        return "🔴 Negatief - bearish sentiment"
-    else:
-        return "🔴⚠️ Zeer negatief - verkoopsignaal"
+    return SCORE_LABELS[bisect_left(SCORE_THRESHOLDS, score)]
+
+def sector_entry(rank, sector, data, headline_key):
+    """Ranking entry for one sector (plus its lead headline), ending in a blank line"""
+    score = data.get('score', 0)
+    entry = SECTOR_ENTRY.format_map({
+        'rank': rank, 'name': get_sector_name(sector), 'sector': sector,
+        'score': score, 'count': data.get('count', 0),
+        'interpretation': interpret_score(score),
+    })
+    headlines = data.get(headline_key, [])
+    if headlines:
+        entry += f"\n   📰 _{headlines[0][:60]}..._"
+    return entry + "\n"
 
 def generate_daily_report():
     """Generate comprehensive daily report"""
@@ -71,48 +102,31 @@ def generate_daily_report():
     lines.append("")
     
     sector_sent = sentiment.get('sector_sentiment', {})
-    sorted_sectors = sorted(sector_sent.items(), key=lambda x: x[1].get('score', 0), reverse=True)
+    def by_score(item):
+        return item[1].get('score', 0)
+    
+    top_sectors = heapq.nlargest(3, sector_sent.items(), key=by_score)
+    # The tail of a stable descending sort: ties keep their original order
+    bottom_sectors = [item for _, item in heapq.nsmallest(
+        3, enumerate(sector_sent.items()), key=lambda e: (by_score(e[1]), -e[0])
+    )][::-1]
     
     # Top 3 Bullish
     lines.append("*📈 MEEST POSITIEF:*")
-    for i, (sector, data) in enumerate(sorted_sectors[:3], 1):
-        score = data.get('score', 0)
-        count = data.get('count', 0)
-        name = get_sector_name(sector)
-        interpretation = interpret_score(score)
-        lines.append(f"{i}. **{name}** ({sector})")
-        lines.append(f"   Score: {score:+.2f} | {count} artikelen")
-        lines.append(f"   → {interpretation}")
-        
-        # Top headline if available
-        top_pos = data.get('top_positive', [])
-        if top_pos:
-            lines.append(f"   📰 _{top_pos[0][:60]}..._")
-        lines.append("")
+    lines.extend(sector_entry(i, sector, data, 'top_positive')
+                 for i, (sector, data) in enumerate(top_sectors, 1))
     
     # Bottom 3 Bearish
     lines.append("*📉 MEEST NEGATIEF:*")
-    for i, (sector, data) in enumerate(sorted_sectors[-3:], 1):
-        score = data.get('score', 0)
-        count = data.get('count', 0)
-        name = get_sector_name(sector)
-        interpretation = interpret_score(score)
-        lines.append(f"{i}. **{name}** ({sector})")
-        lines.append(f"   Score: {score:+.2f} | {count} artikelen")
-        lines.append(f"   → {interpretation}")
-        
-        top_neg = data.get('top_negative', [])
-        if top_neg:
-            lines.append(f"   📰 _{top_neg[0][:60]}..._")
-        lines.append("")
+    lines.extend(sector_entry(i, sector, data, 'top_negative')
+                 for i, (sector, data) in enumerate(bottom_sectors, 1))
     
     # === WHAT THIS MEANS ===
     lines.append("**💡 WAT BETEKENT DIT?**")
     lines.append("")
     
     # Calculate overall market sentiment
-    all_scores = [d.get('score', 0) for d in sector_sent.values()]
-    avg_sentiment = sum(all_scores) / len(all_scores) if all_scores else 0
+    avg_sentiment = fmean(d.get('score', 0) for d in sector_sent.values()) if sector_sent else 0
     
     if avg_sentiment > 0.15:
         lines.append("🟢 **Markt stemming: BULLISH**")
@@ -131,8 +145,8 @@ def generate_daily_report():
         lines.append("")
         
         # Show what each scenario would do
-        top_sector = sorted_sectors[0][0] if sorted_sectors else 'XLK'
-        bottom_sector = sorted_sectors[-1][0] if sorted_sectors else 'XLRE'
+        top_sector = top_sectors[0][0] if top_sectors else 'XLK'
+        bottom_sector = bottom_sectors[-1][0] if bottom_sectors else 'XLRE'
         top_name = get_sector_name(top_sector)
         bottom_name = get_sector_name(bottom_sector)
         
@@ -143,7 +157,10 @@ def generate_daily_report():
         lines.append("")
     
     # === ALERTS ===
-    strong_signals = [(s, d) for s, d in sorted_sectors if abs(d.get('score', 0)) > 0.35]
+    strong_signals = sorted(
+        ((s, d) for s, d in sector_sent.items() if abs(d.get('score', 0)) > 0.35),
+        key=by_score, reverse=True
+    )
     if strong_signals:
         lines.append("**⚠️ STERKE SIGNALEN**")
         for sector, data in strong_signals:
@@ -6,11 +6,19 @@ Checks which companies need embeddings, fetches missing ones via Ollama,
 and provides company context for strategy decisions.
 """
 
+import asyncio
+import functools
 import json
 import os
 import sys
 from datetime import datetime, timedelta
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # company_embeddings.json is then read and written with json
 
 # Config
 EMBEDDINGS_FILE = os.path.join(os.path.dirname(__file__), "company_embeddings.json")
@@ -18,11 +26,38 @@ SECTOR_ASSETS_FILE = os.path.join(os.path.dirname(__file__), "sector_assets.json
 OLLAMA_URL = "http://localhost:11434/api/generate"
 OLLAMA_MODEL = "llama3.1:8b"  # Larger model for better company analysis
 EMBEDDING_MAX_AGE_DAYS = 30  # Refresh embeddings older than this
+MAX_CONCURRENT = 4  # Batch prompts in flight; more only queue up on the Ollama server
+BATCH_SIZE = 6  # Tickers per Ollama prompt; gains flatten out beyond ~8
+PROFILE_NUM_CTX = 8192  # Room for six profiles; per-ticker retries use the same size so llama3.1:8b is not reloaded
+PROFILE_PREDICT_TOKENS = 400  # Answer budget per ticker profile
+PROFILE_TIMEOUT = 60  # Seconds per ticker in a prompt
+
+# One keep-alive connection pool for all Ollama calls (shared by the worker threads)
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT))
+
+PROFILE_SCHEMA = """{
+    "company_name": "Full company name",
+    "sector": "Primary sector",
+    "industry": "Specific industry",
+    "summary": "2-3 sentence description of what the company does",
+    "business_model": "How the company makes money",
+    "key_products": ["product1", "product2", "product3"],
+    "competitors": ["competitor1", "competitor2", "competitor3"],
+    "market_position": "leader/challenger/niche",
+    "volatility": "high/medium/low",
+    "sentiment_factors": ["factor1", "factor2"],
+    "risks": ["risk1", "risk2"],
+    "catalysts": ["potential positive catalyst 1", "catalyst 2"]
+}"""
 
 
 def load_embeddings():
     """Load existing embeddings from file."""
     if os.path.exists(EMBEDDINGS_FILE):
+        if orjson is not None:
+            with open(EMBEDDINGS_FILE, 'rb') as f:
+                return orjson.loads(f.read())
         with open(EMBEDDINGS_FILE, 'r') as f:
             return json.load(f)
     return {"_meta": {"version": 1}, "companies": {}}
@@ -31,30 +66,48 @@ def load_embeddings():
 def save_embeddings(data):
     """Save embeddings to file."""
     data["_meta"]["last_updated"] = datetime.now().isoformat()
-    with open(EMBEDDINGS_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    # Write to a temp file and swap it in so a crash never leaves a truncated file
+    tmp = EMBEDDINGS_FILE + ".tmp"
+    if orjson is not None:
+        with open(tmp, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+    os.replace(tmp, EMBEDDINGS_FILE)
+
+
+@functools.lru_cache(maxsize=1)
+def _read_all_tickers(mtime_ns):
+    """Parse sector_assets.json; cached per file modification time."""
+    tickers = set()
+    with open(SECTOR_ASSETS_FILE, 'r') as f:
+        sector_assets = json.load(f)
+    for sector, assets in sector_assets.items():
+        if sector.startswith("_"):
+            continue
+        for asset in assets:
+            if isinstance(asset, dict):
+                tickers.add(asset.get("ticker", ""))
+            else:
+                tickers.add(asset)
+    return tuple(t for t in tickers if t)
 
 
 def load_all_tickers():
     """Get all tickers from sector_assets.json."""
-    tickers = set()
-    if os.path.exists(SECTOR_ASSETS_FILE):
-        with open(SECTOR_ASSETS_FILE, 'r') as f:
-            sector_assets = json.load(f)
-        for sector, assets in sector_assets.items():
-            if sector.startswith("_"):
-                continue
-            for asset in assets:
-                if isinstance(asset, dict):
-                    tickers.add(asset.get("ticker", ""))
-                else:
-                    tickers.add(asset)
-    return [t for t in tickers if t]
-
-
-def get_missing_embeddings(tickers=None):
-    """Find tickers that need embeddings (missing or outdated)."""
-    embeddings = load_embeddings()
+    if not os.path.exists(SECTOR_ASSETS_FILE):
+        return []
+    return list(_read_all_tickers(os.stat(SECTOR_ASSETS_FILE).st_mtime_ns))
+
+
+def get_missing_embeddings(tickers=None, *, embeddings=None):
+    """
+    Find tickers that need embeddings (missing or outdated).
+    Pass an already loaded embeddings dict to skip re-reading the file.
+    """
+    if embeddings is None:
+        embeddings = load_embeddings()
     companies = embeddings.get("companies", {})
     
     if tickers is None:
@@ -83,38 +136,26 @@ def get_missing_embeddings(tickers=None):
     return missing, outdated
 
 
-def fetch_company_profile(ticker):
-    """Fetch company profile from Ollama."""
-    prompt = f"""Analyze the company with ticker symbol {ticker} and provide a structured profile.
-
-Return ONLY valid JSON (no markdown, no explanation) with this structure:
-{{
-    "company_name": "Full company name",
-    "sector": "Primary sector",
-    "industry": "Specific industry",
-    "summary": "2-3 sentence description of what the company does",
-    "business_model": "How the company makes money",
-    "key_products": ["product1", "product2", "product3"],
-    "competitors": ["competitor1", "competitor2", "competitor3"],
-    "market_position": "leader/challenger/niche",
-    "volatility": "high/medium/low",
-    "sentiment_factors": ["factor1", "factor2"],
-    "risks": ["risk1", "risk2"],
-    "catalysts": ["potential positive catalyst 1", "catalyst 2"]
-}}
-
-If you don't know the company, still return valid JSON with "unknown" values."""
-
+def _generate_json(prompt, label, count=1):
+    """
+    Run one Ollama generation and parse its JSON answer; None on failure.
+    count is the number of profiles asked for; the answer budget and timeout scale with it.
+    """
     try:
-        response = requests.post(
+        response = _SESSION.post(
             OLLAMA_URL,
             json={
                 "model": OLLAMA_MODEL,
                 "prompt": prompt,
                 "stream": False,
-                "options": {"temperature": 0.3}
+                "format": "json",
+                "options": {
+                    "temperature": 0.3,
+                    "num_ctx": PROFILE_NUM_CTX,
+                    "num_predict": PROFILE_PREDICT_TOKENS * count
+                }
             },
-            timeout=60
+            timeout=PROFILE_TIMEOUT * count
         )
         
         if response.status_code == 200:
@@ -129,26 +170,80 @@ If you don't know the company, still return valid JSON with "unknown" values."""
                 text = text.split("```")[1].split("```")[0].strip()
             
             try:
-                profile = json.loads(text)
-                profile["ticker"] = ticker
-                profile["updated"] = datetime.now().isoformat()
-                profile["model_used"] = OLLAMA_MODEL
-                return profile
+                return json.loads(text)
             except json.JSONDecodeError as e:
-                print(f"  JSON parse error for {ticker}: {e}")
+                print(f"  JSON parse error for {label}: {e}")
                 return None
         else:
-            print(f"  Ollama error for {ticker}: {response.status_code}")
+            print(f"  Ollama error for {label}: {response.status_code}")
             return None
             
     except Exception as e:
-        print(f"  Exception fetching {ticker}: {e}")
+        print(f"  Exception fetching {label}: {e}")
         return None
 
 
-def fetch_missing_embeddings(tickers=None, max_fetch=10):
-    """Fetch embeddings for missing/outdated tickers."""
-    missing, outdated = get_missing_embeddings(tickers)
+def _stamp_profile(profile, ticker):
+    """Add the bookkeeping fields to a freshly generated profile."""
+    profile["ticker"] = ticker
+    profile["updated"] = datetime.now().isoformat()
+    profile["model_used"] = OLLAMA_MODEL
+    return profile
+
+
+def fetch_company_profile(ticker):
+    """Fetch company profile from Ollama."""
+    prompt = f"""Analyze the company with ticker symbol {ticker} and provide a structured profile.
+
+Return ONLY valid JSON (no markdown, no explanation) with this structure:
+{PROFILE_SCHEMA}
+
+If you don't know the company, still return valid JSON with "unknown" values."""
+
+    profile = _generate_json(prompt, ticker)
+    if not isinstance(profile, dict):
+        return None
+    return _stamp_profile(profile, ticker)
+
+
+def fetch_company_profiles_batch(tickers):
+    """
+    Fetch profiles for several tickers with a single Ollama prompt.
+    Tickers missing from (or malformed in) the answer are retried one by one.
+    Returns {ticker: profile} for the tickers that succeeded.
+    """
+    profiles = {}
+    if len(tickers) > 1:
+        prompt = f"""Analyze the companies with ticker symbols {', '.join(tickers)} and provide a structured profile for each.
+
+Return ONLY valid JSON (no markdown, no explanation): one object mapping each ticker symbol to a profile with this structure:
+{PROFILE_SCHEMA}
+
+If you don't know a company, still include it with "unknown" values."""
+        
+        result = _generate_json(prompt, ', '.join(tickers), len(tickers))
+        if isinstance(result, dict):
+            for ticker in tickers:
+                profile = result.get(ticker)
+                if isinstance(profile, dict):
+                    profiles[ticker] = _stamp_profile(profile, ticker)
+    
+    for ticker in tickers:
+        if ticker not in profiles:
+            profile = fetch_company_profile(ticker)
+            if profile:
+                profiles[ticker] = profile
+    
+    return profiles
+
+
+async def fetch_missing_embeddings_async(tickers=None, max_fetch=10):
+    """
+    Fetch embeddings for missing/outdated tickers.
+    Tickers go BATCH_SIZE to a prompt, with up to MAX_CONCURRENT prompts at once.
+    """
+    embeddings = load_embeddings()
+    missing, outdated = get_missing_embeddings(tickers, embeddings=embeddings)
     to_fetch = (missing + outdated)[:max_fetch]
     
     if not to_fetch:
@@ -156,18 +251,27 @@ def fetch_missing_embeddings(tickers=None, max_fetch=10):
         return []
     
     print(f"Fetching embeddings for {len(to_fetch)} companies...")
-    embeddings = load_embeddings()
-    fetched = []
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT)
     
-    for ticker in to_fetch:
-        print(f"  Fetching {ticker}...")
-        profile = fetch_company_profile(ticker)
-        if profile:
+    async def fetch(batch):
+        async with semaphore:
+            print(f"  Fetching {', '.join(batch)}...")
+            profiles = await asyncio.to_thread(fetch_company_profiles_batch, batch)
+        for ticker in batch:
+            if ticker in profiles:
+                print(f"    ✓ {ticker}: {profiles[ticker].get('company_name', ticker)}")
+            else:
+                print(f"    ✗ {ticker}: Failed")
+        return profiles
+    
+    batches = [to_fetch[i:i + BATCH_SIZE] for i in range(0, len(to_fetch), BATCH_SIZE)]
+    results = await asyncio.gather(*(fetch(batch) for batch in batches))
+    
+    fetched = []
+    for profiles in results:
+        for ticker, profile in profiles.items():
             embeddings["companies"][ticker] = profile
             fetched.append(ticker)
-            print(f"    ✓ {profile.get('company_name', ticker)}")
-        else:
-            print(f"    ✗ Failed")
     
     if fetched:
         save_embeddings(embeddings)
@@ -176,6 +280,11 @@ def fetch_missing_embeddings(tickers=None, max_fetch=10):
     return fetched
 
 
+def fetch_missing_embeddings(tickers=None, max_fetch=10):
+    """Fetch embeddings for missing/outdated tickers."""
+    return asyncio.run(fetch_missing_embeddings_async(tickers, max_fetch))
+
+
 def get_company_context(tickers):
     """Get company profiles for given tickers."""
     embeddings = load_embeddings()
@@ -195,7 +304,7 @@ def get_embedding_stats():
     companies = embeddings.get("companies", {})
     all_tickers = load_all_tickers()
     
-    missing, outdated = get_missing_embeddings()
+    missing, outdated = get_missing_embeddings(all_tickers, embeddings=embeddings)
     
     return {
         "total_tickers": len(all_tickers),
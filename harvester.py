@@ -4,179 +4,474 @@ News Harvester v3.0 - Comprehensive US Market Coverage
 197 RSS feeds + 61 web scrape sources = 258 total sources
 """
 
+import asyncio
+import hashlib
 import json
 import os
 import re
+import sqlite3
 import ssl
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import islice
+from urllib.error import HTTPError
 from urllib.request import urlopen, Request
 from xml.etree import ElementTree
-from html.parser import HTMLParser
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Config, feed cache and harvest files then go through json
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # Fall back to urllib on thread pools
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None  # Fall back to regex headline extraction
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None  # Fall back to one substring test per keyword
+
 ssl._create_default_https_context = ssl._create_unverified_context
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 HEADERS = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'}
+ASYNC_CONNECTION_LIMIT = 100  # Open sockets across all sources (aiohttp path)
+ASYNC_LIMIT_PER_HOST = 4
+FETCH_WORKERS = 35  # Threads shared by RSS and web fetches (urllib path)
+WEB_MAX_BYTES = 65536  # Headlines sit near the top of a page; skip the rest
+WEB_HEADERS = dict(HEADERS, Range=f'bytes=0-{WEB_MAX_BYTES - 1}')
+SENTIMENT_CACHE_DAYS = 7  # Cached title scores older than this are dropped
 
-class SimpleHTMLParser(HTMLParser):
-    """Extract text from HTML"""
-    def __init__(self):
-        super().__init__()
-        self.text = []
-        self.in_script = False
-        self.in_style = False
-        
-    def handle_starttag(self, tag, attrs):
-        if tag in ['script', 'style']:
-            self.in_script = True
+def load_config():
+    if orjson is not None:
+        with open(os.path.join(BASE_DIR, 'news_sources.json'), 'rb') as f:
+            return orjson.loads(f.read())
+    with open(os.path.join(BASE_DIR, 'news_sources.json')) as f:
+        return json.load(f)
+
+def dump_json(data):
+    """Serialize data as indented UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+def write_atomic(path, payload):
+    """Write bytes to a temp file and swap it in so readers never see a partial file"""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+# Handle RSS 2.0, Atom, and RDF formats
+RSS_ITEM_TAGS = {'item', '{http://www.w3.org/2005/Atom}entry', '{http://purl.org/rss/1.0/}item'}
+RSS_TITLE_TAGS = {'title', '{http://www.w3.org/2005/Atom}title', '{http://purl.org/rss/1.0/}title'}
+RSS_CHUNK_SIZE = 16384
+
+class RSSHeadlineParser:
+    """Incremental feed parser: feed() raw bytes as they arrive until done"""
+    def __init__(self, feed, limit=15):
+        self.source = feed['name']
+        self.limit = limit
+        self.items = 0
+        self.headlines = []
+        self.parser = ElementTree.XMLPullParser(events=('end',))
+    
+    @property
+    def done(self):
+        return self.items >= self.limit
     
-    def handle_endtag(self, tag):
-        if tag in ['script', 'style']:
-            self.in_script = False
+    def feed(self, data):
+        self.parser.feed(data)
+        for _, elem in self.parser.read_events():
+            if elem.tag not in RSS_ITEM_TAGS or self.done:
+                continue
+            self.items += 1
             
-    def handle_data(self, data):
-        if not self.in_script:
-            self.text.append(data.strip())
+            title = next((child for child in elem if child.tag in RSS_TITLE_TAGS), None)
+            if title is not None and title.text:
+                text = title.text.strip()
+                if len(text) > 10:  # Filter out too short titles
+                    self.headlines.append({
+                        'title': text[:200],
+                        'source': self.source,
+                        'type': 'rss'
+                    })
+            elem.clear()  # Parsed items are not needed again
     
-    def get_text(self):
-        return ' '.join(filter(None, self.text))
+    def close(self):
+        """Finish parsing; raises ParseError on an empty or malformed feed unless we stopped early"""
+        if not self.done:
+            self.parser.close()
+        return self.headlines
 
-def load_config():
-    with open(os.path.join(BASE_DIR, 'news_sources.json')) as f:
-        return json.load(f)
+def load_feed_cache():
+    """Per-feed validators and last headlines from the previous harvest: {url: {etag, last_modified, headlines}}"""
+    path = os.path.join(BASE_DIR, 'data', 'feed_cache.json')
+    try:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read()) if orjson is not None else json.loads(f.read())
+    except (OSError, ValueError):
+        return {}
 
-def fetch_rss(feed, timeout=8):
-    """Fetch and parse RSS feed"""
-    headlines = []
+def save_feed_cache(cache):
+    os.makedirs(os.path.join(BASE_DIR, 'data'), exist_ok=True)
+    write_atomic(os.path.join(BASE_DIR, 'data', 'feed_cache.json'), dump_json(cache))
+
+def _conditional_headers(feed, cache):
+    """Request headers, plus If-None-Match / If-Modified-Since when we have validators"""
+    entry = cache.get(feed['url']) if cache is not None else None
+    if not entry:
+        return HEADERS
+    headers = dict(HEADERS)
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+def _remember_feed(feed, cache, response_headers, headlines):
+    """Store the response validators so the next harvest can ask for a 304"""
+    if cache is None:
+        return
+    etag = response_headers.get('ETag')
+    last_modified = response_headers.get('Last-Modified')
+    if etag or last_modified:
+        cache[feed['url']] = {'etag': etag, 'last_modified': last_modified, 'headlines': headlines}
+    else:
+        cache.pop(feed['url'], None)
+
+def fetch_rss(feed, timeout=8, cache=None):
+    """
+    Fetch and parse RSS feed, streaming; stops downloading after 15 items.
+    With a feed cache, unchanged feeds (HTTP 304) reuse the previous headlines.
+    """
     try:
-        req = Request(feed['url'], headers=HEADERS)
+        parser = RSSHeadlineParser(feed)
+        req = Request(feed['url'], headers=_conditional_headers(feed, cache))
         with urlopen(req, timeout=timeout) as response:
-            content = response.read()
-            tree = ElementTree.fromstring(content)
-            
-            # Handle RSS 2.0, Atom, and RDF formats
-            items = (tree.findall('.//item') or 
-                    tree.findall('.//{http://www.w3.org/2005/Atom}entry') or
-                    tree.findall('.//{http://purl.org/rss/1.0/}item'))
-            
-            for item in items[:15]:
-                title = (item.find('title') or 
-                        item.find('{http://www.w3.org/2005/Atom}title') or
-                        item.find('{http://purl.org/rss/1.0/}title'))
-                
-                if title is not None and title.text:
-                    text = title.text.strip()
-                    if len(text) > 10:  # Filter out too short titles
-                        headlines.append({
-                            'title': text[:200],
-                            'source': feed['name'],
-                            'type': 'rss'
-                        })
+            while not parser.done:
+                chunk = response.read(RSS_CHUNK_SIZE)
+                if not chunk:
+                    break
+                parser.feed(chunk)
+        headlines = parser.close()
+        _remember_feed(feed, cache, response.headers, headlines)
         return headlines, True
+    except HTTPError as e:
+        if e.code == 304 and cache and feed['url'] in cache:
+            return cache[feed['url']]['headlines'], True
+        return [], False
     except Exception as e:
         return [], False
 
-def fetch_webpage(site, timeout=10):
-    """Fetch webpage and extract headlines via simple pattern matching"""
+# Headlines in <h1>, <h2>, <h3>, <a> tags with meaningful text; tried in this order
+HEADLINE_PATTERNS = [
+    re.compile(r'<h[123][^>]*>([^<]{20,150})</h[123]>', re.IGNORECASE),
+    re.compile(r'<a[^>]*>([^<]{25,150})</a>', re.IGNORECASE),
+    re.compile(r'"headline"[^>]*>([^<]{20,150})<', re.IGNORECASE),
+    re.compile(r'title="([^"]{25,150})"', re.IGNORECASE),
+]
+# DOM equivalents of the patterns above: (css selector, attribute or None for text, min length)
+HEADLINE_SELECTORS = [
+    ('h1, h2, h3', None, 20),
+    ('a', None, 25),
+    ('.headline, [itemprop="headline"]', None, 20),
+    ('[title]', 'title', 25),
+]
+TAG_RE = re.compile(r'<[^>]+>')
+WHITESPACE_RE = re.compile(r'\s+')
+
+def _dom_candidates(html, limit):
+    """Candidate headline texts from a parsed DOM, at most `limit` per selector"""
+    tree = LexborHTMLParser(html)
+    for selector, attr, min_len in HEADLINE_SELECTORS:
+        texts = ((node.attributes.get(attr) or '') if attr else node.text(separator=' ', strip=True)
+                 for node in tree.css(selector))
+        yield from islice((t for t in texts if min_len <= len(t) <= 150), limit)
+
+def _regex_candidates(html, limit):
+    """Candidate headline texts from the regex patterns, at most `limit` per pattern"""
+    for pattern in HEADLINE_PATTERNS:
+        for match in islice(pattern.finditer(html), limit):
+            yield TAG_RE.sub('', match.group(1))
+
+def extract_headlines(html, site, limit=10):
+    """Extract headlines from a web page (DOM parse when selectolax is installed, else regex)"""
+    candidates = _dom_candidates if LexborHTMLParser is not None else _regex_candidates
     headlines = []
+    found = set()
+    
+    for text in candidates(html, limit):
+        text = WHITESPACE_RE.sub(' ', text.strip())
+        if len(text) > 20 and text not in found:
+            found.add(text)
+            headlines.append({
+                'title': text[:200],
+                'source': site['name'],
+                'type': 'web'
+            })
+            if len(headlines) >= limit:
+                break
+    
+    return headlines
+
+def fetch_webpage(site, timeout=10):
+    """Fetch the top of a webpage and extract headlines via simple pattern matching"""
     try:
-        req = Request(site['url'], headers=HEADERS)
+        req = Request(site['url'], headers=WEB_HEADERS)
         with urlopen(req, timeout=timeout) as response:
-            html = response.read().decode('utf-8', errors='ignore')
-            
-            # Simple headline extraction - look for common patterns
-            # Headlines in <h1>, <h2>, <h3>, <a> tags with meaningful text
-            patterns = [
-                r'<h[123][^>]*>([^<]{20,150})</h[123]>',
-                r'<a[^>]*>([^<]{25,150})</a>',
-                r'"headline"[^>]*>([^<]{20,150})<',
-                r'title="([^"]{25,150})"',
-            ]
-            
-            found = set()
-            for pattern in patterns:
-                matches = re.findall(pattern, html, re.IGNORECASE)
-                for match in matches[:10]:
-                    text = re.sub(r'<[^>]+>', '', match).strip()
-                    text = re.sub(r'\s+', ' ', text)
-                    if len(text) > 20 and text not in found:
-                        found.add(text)
-                        headlines.append({
-                            'title': text[:200],
-                            'source': site['name'],
-                            'type': 'web'
-                        })
-            
-        return headlines[:10], True
+            # Servers that ignore Range send 200 with the full page; read only the top either way
+            html = response.read(WEB_MAX_BYTES).decode('utf-8', errors='ignore')
+        return extract_headlines(html, site), True
+    except Exception as e:
+        return [], False
+
+async def fetch_rss_async(session, feed, timeout=8, cache=None):
+    """aiohttp variant of fetch_rss"""
+    try:
+        parser = RSSHeadlineParser(feed)
+        async with session.get(feed['url'], headers=_conditional_headers(feed, cache),
+                               timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status == 304 and cache and feed['url'] in cache:
+                return cache[feed['url']]['headlines'], True
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(RSS_CHUNK_SIZE):
+                parser.feed(chunk)
+                if parser.done:
+                    break
+            headlines = parser.close()
+            _remember_feed(feed, cache, response.headers, headlines)
+        return headlines, True
     except Exception as e:
         return [], False
 
-def classify_sectors(headline, sectors):
-    """Classify headline into sectors based on keywords"""
+async def fetch_webpage_async(session, site, timeout=10):
+    """aiohttp variant of fetch_webpage"""
+    try:
+        async with session.get(site['url'], headers=WEB_HEADERS,
+                               timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            response.raise_for_status()
+            body = b''
+            async for chunk in response.content.iter_chunked(WEB_MAX_BYTES):
+                body += chunk
+                if len(body) >= WEB_MAX_BYTES:
+                    break
+            html = body[:WEB_MAX_BYTES].decode('utf-8', errors='ignore')
+        return extract_headlines(html, site), True
+    except Exception as e:
+        return [], False
+
+async def fetch_all_async(rss_feeds, web_sites, feed_cache=None):
+    """Fetch every feed and site on one event loop; returns (rss_results, web_results)"""
+    connector = aiohttp.TCPConnector(
+        limit=ASYNC_CONNECTION_LIMIT, limit_per_host=ASYNC_LIMIT_PER_HOST,
+        ttl_dns_cache=300, ssl=False
+    )
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS) as session:
+        results = await asyncio.gather(
+            *(fetch_rss_async(session, feed, cache=feed_cache) for feed in rss_feeds),
+            *(fetch_webpage_async(session, site) for site in web_sites)
+        )
+    return results[:len(rss_feeds)], results[len(rss_feeds):]
+
+def build_sector_automaton(sectors):
+    """
+    One Aho-Corasick automaton over every sector keyword; values are the indices
+    (in `sectors` order) of the sectors using that keyword. None without pyahocorasick.
+    """
+    if ahocorasick is None:
+        return None
+    owners = {}
+    for i, sector_info in enumerate(sectors.values()):
+        for keyword in sector_info.get('keywords', []):
+            owners.setdefault(keyword.lower(), set()).add(i)
+    if '' in owners:
+        return None  # An empty keyword matches everything; leave that to the plain scan
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, indices in owners.items():
+        automaton.add_word(keyword, tuple(indices))
+    automaton.make_automaton()
+    return automaton
+
+def classify_sectors(headline, sectors, automaton=None):
+    """Classify headline into sectors based on keywords (single scan when given an automaton)"""
     title_lower = headline['title'].lower()
-    matched = []
     
+    if automaton is not None:
+        codes = list(sectors)
+        hits = {i for _, indices in automaton.iter(title_lower) for i in indices}
+        matched = [codes[i] for i in sorted(hits)]
+        return matched if matched else ['general']
+    
+    matched = []
     for sector_code, sector_info in sectors.items():
-        for keyword in sector_info['keywords']:
+        for keyword in sector_info.get('keywords', []):
             if keyword.lower() in title_lower:
                 matched.append(sector_code)
                 break
     
     return matched if matched else ['general']
 
+STRONG_POSITIVE = ['surge', 'soar', 'skyrocket', 'boom', 'breakout', 'record high', 'all-time high', 'beat expectations', 'blowout', 'massive gain']
+POSITIVE = ['rise', 'gain', 'up', 'jump', 'rally', 'climb', 'advance', 'bullish', 'optimistic', 'growth', 'profit', 'beat', 'upgrade', 'buy', 'outperform', 'strong', 'recovery', 'expand', 'success', 'boost', 'improve', 'positive', 'higher', 'increase', 'exceed', 'momentum', 'breakthrough', 'innovation', 'deal', 'partnership', 'acquisition', 'launch', 'stijg', 'winst', 'groei', 'positief']
+
+STRONG_NEGATIVE = ['crash', 'plunge', 'collapse', 'tank', 'disaster', 'crisis', 'bankruptcy', 'fraud', 'scandal', 'all-time low', 'miss badly']
+NEGATIVE = ['fall', 'drop', 'down', 'decline', 'sink', 'slip', 'bearish', 'pessimistic', 'loss', 'miss', 'cut', 'downgrade', 'sell', 'underperform', 'weak', 'warning', 'risk', 'fear', 'concern', 'worry', 'threat', 'layoff', 'recession', 'inflation', 'debt', 'default', 'lawsuit', 'investigation', 'probe', 'lower', 'decrease', 'slowdown', 'delay', 'daal', 'verlies', 'negatief', 'risico']
+
+# (keyword, weight) in scoring order
+SENTIMENT_TERMS = (
+    [(w, 0.4) for w in STRONG_POSITIVE] + [(w, 0.15) for w in POSITIVE] +
+    [(w, -0.4) for w in STRONG_NEGATIVE] + [(w, -0.15) for w in NEGATIVE]
+)
+
+def _build_sentiment_automaton():
+    """One Aho-Corasick automaton over all sentiment keywords; values are (order, weight)"""
+    automaton = ahocorasick.Automaton()
+    for order, (word, weight) in enumerate(SENTIMENT_TERMS):
+        automaton.add_word(word, (order, weight))
+    automaton.make_automaton()
+    return automaton
+
+_SENTIMENT_AUTOMATON = _build_sentiment_automaton() if ahocorasick is not None else None
+
 def simple_sentiment(text):
     """Enhanced keyword-based sentiment analysis"""
     text_lower = text.lower()
     
-    strong_positive = ['surge', 'soar', 'skyrocket', 'boom', 'breakout', 'record high', 'all-time high', 'beat expectations', 'blowout', 'massive gain']
-    positive = ['rise', 'gain', 'up', 'jump', 'rally', 'climb', 'advance', 'bullish', 'optimistic', 'growth', 'profit', 'beat', 'upgrade', 'buy', 'outperform', 'strong', 'recovery', 'expand', 'success', 'boost', 'improve', 'positive', 'higher', 'increase', 'exceed', 'momentum', 'breakthrough', 'innovation', 'deal', 'partnership', 'acquisition', 'launch', 'stijg', 'winst', 'groei', 'positief']
+    if _SENTIMENT_AUTOMATON is not None:
+        # Single scan; each keyword counts once, summed in the same order as the list scan
+        score = 0
+        for _, weight in sorted({hit for _, hit in _SENTIMENT_AUTOMATON.iter(text_lower)}):
+            score += weight
+    else:
+        score = 0
+        for word, weight in SENTIMENT_TERMS:
+            if word in text_lower:
+                score += weight
     
-    strong_negative = ['crash', 'plunge', 'collapse', 'tank', 'disaster', 'crisis', 'bankruptcy', 'fraud', 'scandal', 'all-time low', 'miss badly']
-    negative = ['fall', 'drop', 'down', 'decline', 'sink', 'slip', 'bearish', 'pessimistic', 'loss', 'miss', 'cut', 'downgrade', 'sell', 'underperform', 'weak', 'warning', 'risk', 'fear', 'concern', 'worry', 'threat', 'layoff', 'recession', 'inflation', 'debt', 'default', 'lawsuit', 'investigation', 'probe', 'lower', 'decrease', 'slowdown', 'delay', 'daal', 'verlies', 'negatief', 'risico']
+    return max(min(score, 1.0), -1.0)
+
+# Cache keys change whenever the keyword list does, so stale scores are never reused
+_VOCAB_DIGEST = hashlib.blake2b(repr(SENTIMENT_TERMS).encode('utf-8'), digest_size=16).digest()
+
+def _title_key(title):
+    """Stable signed 64-bit key of a normalized title (fits an SQLite INTEGER PRIMARY KEY)"""
+    digest = hashlib.blake2b(title.lower().encode('utf-8'), digest_size=8, key=_VOCAB_DIGEST).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def _open_sentiment_cache():
+    path = os.path.join(BASE_DIR, 'data', 'sentiment_cache.sqlite')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA mmap_size=268435456")
+    # score has no declared type so the int 0 of keyword-free titles stays an int
+    conn.execute("CREATE TABLE IF NOT EXISTS scores (title_hash INTEGER PRIMARY KEY, score, created TEXT)")
+    return conn
+
+def score_headlines_cached(titles):
+    """simple_sentiment for a list of titles, reusing scores of titles seen in earlier harvests"""
+    keys = [_title_key(title) for title in titles]
+    unique = list(set(keys))
+    known = {}
     
-    score = 0
-    for word in strong_positive:
-        if word in text_lower: score += 0.4
-    for word in positive:
-        if word in text_lower: score += 0.15
-    for word in strong_negative:
-        if word in text_lower: score -= 0.4
-    for word in negative:
-        if word in text_lower: score -= 0.15
+    conn = _open_sentiment_cache()
+    try:
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            known.update(conn.execute(
+                f"SELECT title_hash, score FROM scores WHERE title_hash IN ({','.join('?' * len(chunk))})",
+                chunk
+            ))
+        
+        misses = {}
+        for key, title in zip(keys, titles):
+            if key not in known:
+                misses.setdefault(key, title)
+        fresh = {key: simple_sentiment(title) for key, title in misses.items()}
+        
+        now = datetime.now()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                             [(key, score, now.isoformat()) for key, score in fresh.items()])
+            conn.execute("DELETE FROM scores WHERE created < ?",
+                         ((now - timedelta(days=SENTIMENT_CACHE_DAYS)).isoformat(),))
+        known.update(fresh)
+    finally:
+        conn.close()
     
-    return max(min(score, 1.0), -1.0)
+    return [known[key] for key in keys]
 
 def aggregate_sentiment(headlines, sectors):
     """Aggregate sentiment per sector"""
-    sector_data = {code: {'headlines': [], 'scores': []} for code in sectors.keys()}
-    sector_data['general'] = {'headlines': [], 'scores': []}
+    codes = list(dict.fromkeys([*sectors, 'general']))
+    code_index = {code: i for i, code in enumerate(codes)}
     
-    for hl in headlines:
-        sentiment = simple_sentiment(hl['title'])
+    # Structure of arrays: one score per headline, one (headline, sector) row per membership
+    raw_scores = score_headlines_cached([hl['title'] for hl in headlines])
+    pair_headline = []
+    pair_sector = []
+    for i, (hl, sentiment) in enumerate(zip(headlines, raw_scores)):
         hl['sentiment'] = round(sentiment, 2)
         
         for sector in hl.get('sectors', ['general']):
-            if sector in sector_data:
-                sector_data[sector]['headlines'].append(hl)
-                sector_data[sector]['scores'].append(sentiment)
+            j = code_index.get(sector)
+            if j is not None:
+                pair_headline.append(i)
+                pair_sector.append(j)
+    
+    scores = np.array(raw_scores, dtype=np.float64)
+    strength = np.abs(np.fromiter((hl['sentiment'] for hl in headlines), dtype=np.float64, count=len(headlines)))
+    pair_headline = np.array(pair_headline, dtype=np.intp)
+    pair_sector = np.array(pair_sector, dtype=np.intp)
+    
+    # bincount adds in input order, so the sums match a sequential Python sum
+    counts = np.bincount(pair_sector, minlength=len(codes))
+    sums = np.bincount(pair_sector, weights=scores[pair_headline], minlength=len(codes)).tolist()
+    
+    # Group rows by sector, strongest first; lexsort is stable so ties keep headline order
+    order = np.lexsort((-strength[pair_headline], pair_sector))
+    rank = np.arange(len(order)) - np.repeat(np.cumsum(counts) - counts, counts)
+    top = pair_headline[order[rank < 5]].tolist()
+    top_counts = np.minimum(counts, 5).tolist()
     
     results = {}
-    for sector, data in sector_data.items():
-        if data['scores']:
-            avg = sum(data['scores']) / len(data['scores'])
-            top_headlines = sorted(data['headlines'], key=lambda x: abs(x['sentiment']), reverse=True)[:5]
-            results[sector] = {
-                'score': round(avg, 3),
-                'count': len(data['scores']),
-                'signal': 'BUY' if avg > 0.25 else ('SELL' if avg < -0.25 else 'HOLD'),
-                'top_positive': [h['title'][:80] for h in top_headlines if h['sentiment'] > 0][:2],
-                'top_negative': [h['title'][:80] for h in top_headlines if h['sentiment'] < 0][:2]
-            }
+    start = 0
+    for j, (sector, count) in enumerate(zip(codes, counts.tolist())):
+        if not count:
+            continue
+        top_headlines = [headlines[i] for i in top[start:start + top_counts[j]]]
+        start += top_counts[j]
+        
+        avg = sums[j] / count
+        results[sector] = {
+            'score': round(avg, 3),
+            'count': count,
+            'signal': 'BUY' if avg > 0.25 else ('SELL' if avg < -0.25 else 'HOLD'),
+            'top_positive': [h['title'][:80] for h in top_headlines if h['sentiment'] > 0][:2],
+            'top_negative': [h['title'][:80] for h in top_headlines if h['sentiment'] < 0][:2]
+        }
     
     return results
 
+def rank_sectors(sector_sentiment):
+    """(sector, data) pairs by descending score; equal scores keep their original order"""
+    items = list(sector_sentiment.items())
+    scores = np.fromiter((data['score'] for _, data in items), dtype=np.float64, count=len(items))
+    return [items[i] for i in np.argsort(-scores, kind='stable').tolist()]
+
 def harvest_all(verbose=True):
     """Main harvest function with parallel fetching"""
     config = load_config()
@@ -195,46 +490,49 @@ def harvest_all(verbose=True):
             feed['category'] = category
             rss_feeds.append(feed)
     
+    # Collect web scrape sites
+    web_sites = []
+    for category, sites in config.get('web_scrape', {}).items():
+        for site in sites:
+            site['category'] = category
+            web_sites.append(site)
+    
     if verbose:
         print(f"🔄 Harvesting {len(rss_feeds)} RSS feeds...")
+        if web_sites:
+            print(f"🌐 Scraping {len(web_sites)} websites...")
     
-    # Parallel RSS fetching
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        futures = {executor.submit(fetch_rss, feed): feed for feed in rss_feeds}
-        for future in as_completed(futures):
-            headlines, success = future.result()
-            if success:
-                stats['rss_success'] += 1
-                all_headlines.extend(headlines)
-            else:
-                stats['rss_fail'] += 1
+    feed_cache = load_feed_cache()
+    if aiohttp is not None:
+        # All sources multiplexed on a single event loop
+        rss_results, web_results = asyncio.run(fetch_all_async(rss_feeds, web_sites, feed_cache))
+    else:
+        # One shared pool, so web scraping overlaps the RSS tail
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            futures = {executor.submit(fetch_rss, feed, cache=feed_cache): 'rss' for feed in rss_feeds}
+            futures.update({executor.submit(fetch_webpage, site): 'web' for site in web_sites})
+            rss_results, web_results = [], []
+            for future in as_completed(futures):
+                (rss_results if futures[future] == 'rss' else web_results).append(future.result())
+    save_feed_cache(feed_cache)
+    
+    for headlines, success in rss_results:
+        if success:
+            stats['rss_success'] += 1
+            all_headlines.extend(headlines)
+        else:
+            stats['rss_fail'] += 1
+    
+    for headlines, success in web_results:
+        if success:
+            stats['web_success'] += 1
+            all_headlines.extend(headlines)
+        else:
+            stats['web_fail'] += 1
     
     if verbose:
         print(f"   ✓ RSS: {stats['rss_success']} succeeded, {stats['rss_fail']} failed")
-    
-    # Collect web scrape sites
-    if 'web_scrape' in config:
-        web_sites = []
-        for category, sites in config['web_scrape'].items():
-            for site in sites:
-                site['category'] = category
-                web_sites.append(site)
-        
-        if verbose:
-            print(f"🌐 Scraping {len(web_sites)} websites...")
-        
-        # Parallel web scraping
-        with ThreadPoolExecutor(max_workers=15) as executor:
-            futures = {executor.submit(fetch_webpage, site): site for site in web_sites}
-            for future in as_completed(futures):
-                headlines, success = future.result()
-                if success:
-                    stats['web_success'] += 1
-                    all_headlines.extend(headlines)
-                else:
-                    stats['web_fail'] += 1
-        
-        if verbose:
+        if web_sites:
             print(f"   ✓ Web: {stats['web_success']} succeeded, {stats['web_fail']} failed")
     
     # Deduplicate headlines
@@ -251,12 +549,13 @@ def harvest_all(verbose=True):
     
     # Classify sectors
     sectors = config.get('us_sectors', {})
+    sector_automaton = build_sector_automaton(sectors)
     for hl in unique_headlines:
-        hl['sectors'] = classify_sectors(hl, sectors)
+        hl['sectors'] = classify_sectors(hl, sectors, sector_automaton)
     
     # Calculate sentiment
     sector_sentiment = aggregate_sentiment(unique_headlines, sectors)
-    sorted_sectors = sorted(sector_sentiment.items(), key=lambda x: x[1]['score'], reverse=True)
+    sorted_sectors = rank_sectors(sector_sentiment)
     
     # Build report
     report = {
@@ -284,13 +583,12 @@ def harvest_all(verbose=True):
     os.makedirs(output_dir, exist_ok=True)
     
     output_file = os.path.join(output_dir, f'harvest_{hour}00.json')
-    with open(output_file, 'w') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    payload = dump_json(report)
+    write_atomic(output_file, payload)
     
-    # Also save latest
+    # Also save latest (same bytes, serialized once)
     latest_file = os.path.join(BASE_DIR, 'data', 'latest_harvest.json')
-    with open(latest_file, 'w') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    write_atomic(latest_file, payload)
     
     if verbose:
         print(f"\n{'='*70}")
@@ -1,22 +1,35 @@
 #!/usr/bin/env python3
 """
 News Harvester v4.0 - With Ollama LLM Sentiment Analysis
-Runs on MacMini with llama3.1:8b for accurate sentiment scoring
+Runs on MacMini with llama3.2:3b (4-bit quantized) for fast sentiment scoring
 """
 
+import asyncio
+import gzip
 import json
 import os
 import re
-import ssl
+import sqlite3
+import threading
 import time
-import urllib.request
-import urllib.error
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import islice
 from xml.etree import ElementTree
-from html.parser import HTMLParser
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-ssl._create_default_https_context = ssl._create_unverified_context
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None  # Fall back to one substring test per keyword
+
+from harvester import (
+    RSS_ITEM_TAGS, RSS_TITLE_TAGS, build_sector_automaton, classify_sectors, dump_json, write_atomic,
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
@@ -24,8 +37,33 @@ HEADERS = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleW
 
 # Ollama settings
 OLLAMA_URL = "http://localhost:11434/api/generate"
-OLLAMA_MODEL = "llama3.1:8b"
+OLLAMA_MODEL = "llama3.2:3b"  # Default tag is Q4_K_M; plenty for a single-number answer
 USE_OLLAMA = True  # Set to False to fall back to keyword-based
+OLLAMA_CONCURRENCY = 4  # Ollama requests in flight at once
+OLLAMA_BATCH_SIZE = 20  # Headlines scored per prompt
+OLLAMA_NUM_CTX = 2048  # Fits a 20-headline batch; single-headline fallbacks reuse it so llama3.2:3b stays loaded
+KEYWORD_CONFIDENT_SCORE = 0.4  # Keyword scores at least this strong skip the LLM
+
+# Cache of Ollama scores: exact normalized-title hits, then near-duplicates by embedding
+SENTIMENT_CACHE_FILE = os.path.join(DATA_DIR, 'ollama_sentiment_cache.sqlite')
+OLLAMA_EMBED_URL = "http://localhost:11434/api/embed"
+EMBED_MODEL = "nomic-embed-text"
+SIMILARITY_THRESHOLD = 0.95
+SENTIMENT_CACHE_DAYS = 7  # Cached title scores older than this are dropped
+
+# Keep-alive connections to Ollama, shared by the analysis worker threads
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2 * OLLAMA_CONCURRENCY, pool_block=True))
+
+# Keep-alive connections for feeds and sites, so hosts serving many feeds are handshaken once.
+# Certificates are not verified, as with the unverified urllib context this replaces.
+FETCH_POOL_SIZE = 32
+_FETCH_SESSION = requests.Session()
+_FETCH_SESSION.headers.update(HEADERS)
+_FETCH_SESSION.verify = False
+_FETCH_SESSION.mount('http://', HTTPAdapter(pool_connections=FETCH_POOL_SIZE, pool_maxsize=FETCH_POOL_SIZE))
+_FETCH_SESSION.mount('https://', HTTPAdapter(pool_connections=FETCH_POOL_SIZE, pool_maxsize=FETCH_POOL_SIZE))
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 SENTIMENT_PROMPT = """Rate the financial/market sentiment of this news headline.
 Score from -1.0 (very bearish/negative) to +1.0 (very bullish/positive).
@@ -35,27 +73,13 @@ Headline: "{headline}"
 
 Score:"""
 
-class SimpleHTMLParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.text = []
-        self.in_script = False
-        
-    def handle_starttag(self, tag, attrs):
-        if tag in ['script', 'style']:
-            self.in_script = True
-    
-    def handle_endtag(self, tag):
-        if tag in ['script', 'style']:
-            self.in_script = False
-            
-    def handle_data(self, data):
-        if not self.in_script:
-            self.text.append(data.strip())
-    
-    def get_text(self):
-        return ' '.join(filter(None, self.text))
+BATCH_SENTIMENT_PROMPT = """Rate the financial/market sentiment of each numbered news headline.
+Score from -1.0 (very bearish/negative) to +1.0 (very bullish/positive).
+RESPOND WITH ONLY ONE LINE PER HEADLINE, formatted as "<number>: <score>". No explanation.
 
+{headlines}
+
+Scores:"""
 
 def load_config():
     """Load news sources configuration"""
@@ -65,23 +89,20 @@ def load_config():
 
 
 def fetch_rss(feed, timeout=8):
-    """Fetch and parse RSS feed"""
+    """Fetch and stream-parse RSS feed; stops reading after 15 items"""
     headlines = []
     try:
-        req = urllib.request.Request(feed['url'], headers=HEADERS)
-        with urllib.request.urlopen(req, timeout=timeout) as response:
-            content = response.read()
-            tree = ElementTree.fromstring(content)
-            
-            items = (tree.findall('.//item') or 
-                    tree.findall('.//{http://www.w3.org/2005/Atom}entry') or
-                    tree.findall('.//{http://purl.org/rss/1.0/}item'))
+        with _FETCH_SESSION.get(feed['url'], timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True  # Undo gzip/deflate transfer encoding
             
-            for item in items[:15]:
-                title = (item.find('title') or 
-                        item.find('{http://www.w3.org/2005/Atom}title') or
-                        item.find('{http://purl.org/rss/1.0/}title'))
+            items = 0
+            for _, elem in ElementTree.iterparse(response.raw, events=('end',)):
+                if elem.tag not in RSS_ITEM_TAGS:
+                    continue
+                items += 1
                 
+                title = next((child for child in elem if child.tag in RSS_TITLE_TAGS), None)
                 if title is not None and title.text:
                     text = title.text.strip()
                     if len(text) > 10:
@@ -90,32 +111,40 @@ def fetch_rss(feed, timeout=8):
                             'source': feed['name'],
                             'type': 'rss'
                         })
+                elem.clear()
+                if items >= 15:
+                    break
         return headlines, True
     except Exception:
         return [], False
 
 
+# Headlines in <h1>, <h2>, <h3>, <a> tags with meaningful text; tried in this order
+# Byte patterns: the page is never decoded as a whole, only the matched fragments are
+HEADLINE_PATTERNS = [
+    re.compile(rb'<h[123][^>]*>([^<]{20,150})</h[123]>', re.IGNORECASE),
+    re.compile(rb'<a[^>]*>([^<]{25,150})</a>', re.IGNORECASE),
+    re.compile(rb'"headline"[^>]*>([^<]{20,150})<', re.IGNORECASE),
+    re.compile(rb'title="([^"]{25,150})"', re.IGNORECASE),
+]
+TAG_RE = re.compile(r'<[^>]+>')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
 def fetch_webpage(site, timeout=10):
     """Fetch webpage and extract headlines"""
     headlines = []
     try:
-        req = urllib.request.Request(site['url'], headers=HEADERS)
-        with urllib.request.urlopen(req, timeout=timeout) as response:
-            html = response.read().decode('utf-8', errors='ignore')
-            
-            patterns = [
-                r'<h[123][^>]*>([^<]{20,150})</h[123]>',
-                r'<a[^>]*>([^<]{25,150})</a>',
-                r'"headline"[^>]*>([^<]{20,150})<',
-                r'title="([^"]{25,150})"',
-            ]
+        with _FETCH_SESSION.get(site['url'], timeout=timeout) as response:
+            response.raise_for_status()
+            html = response.content
             
+            # At most 10 matches per pattern; stop once we have 10 headlines
             found = set()
-            for pattern in patterns:
-                matches = re.findall(pattern, html, re.IGNORECASE)
-                for match in matches[:10]:
-                    text = re.sub(r'<[^>]+>', '', match).strip()
-                    text = re.sub(r'\s+', ' ', text)
+            for pattern in HEADLINE_PATTERNS:
+                for match in islice(pattern.finditer(html), 10):
+                    text = TAG_RE.sub('', match.group(1).decode('utf-8', errors='ignore')).strip()
+                    text = WHITESPACE_RE.sub(' ', text)
                     if len(text) > 20 and text not in found:
                         found.add(text)
                         headlines.append({
@@ -123,6 +152,8 @@ def fetch_webpage(site, timeout=10):
                             'source': site['name'],
                             'type': 'web'
                         })
+                if len(headlines) >= 10:
+                    break
             
         return headlines[:10], True
     except Exception:
@@ -131,133 +162,357 @@ def fetch_webpage(site, timeout=10):
 
 def ollama_sentiment(headline, timeout=20):
     """Get sentiment score from Ollama"""
-    payload = json.dumps({
+    payload = {
         "model": OLLAMA_MODEL,
         "prompt": SENTIMENT_PROMPT.format(headline=headline),
         "stream": False,
-        "options": {"temperature": 0.1, "num_predict": 10}
-    }).encode('utf-8')
+        "options": {"temperature": 0.1, "num_predict": 5, "num_ctx": OLLAMA_NUM_CTX}
+    }
     
     try:
-        req = urllib.request.Request(
-            OLLAMA_URL,
-            data=payload,
-            headers={"Content-Type": "application/json"}
-        )
+        resp = _SESSION.post(OLLAMA_URL, json=payload, timeout=timeout)
+        resp.raise_for_status()
+        result = resp.json()
+        response_text = result.get('response', '0').strip()
         
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            result = json.loads(resp.read().decode('utf-8'))
-            response_text = result.get('response', '0').strip()
-            
-            match = re.search(r'[-+]?\d*\.?\d+', response_text)
-            if match:
-                score = float(match.group())
-                return max(min(score, 1.0), -1.0)
-            return 0.0
+        match = re.search(r'[-+]?\d*\.?\d+', response_text)
+        if match:
+            score = float(match.group())
+            return max(min(score, 1.0), -1.0)
+        return 0.0
     except Exception as e:
         return None
 
 
-def keyword_sentiment(text):
-    """Fallback keyword-based sentiment"""
-    text_lower = text.lower()
-    
-    strong_pos = ['surge', 'soar', 'skyrocket', 'boom', 'record high', 'beat expectations', 'blowout']
-    pos = ['rise', 'gain', 'up', 'jump', 'rally', 'climb', 'bullish', 'growth', 'profit', 'beat', 'upgrade', 'buy', 'strong', 'expand', 'boost', 'positive', 'higher', 'increase', 'breakthrough', 'deal', 'partnership', 'launch']
+# "<number>: <score>" lines in a batch answer
+BATCH_SCORE_RE = re.compile(r'^\s*(\d+)\s*[:.)]\s*([-+]?\d*\.?\d+)', re.MULTILINE)
+
+def ollama_sentiment_batch(headlines, timeout=60):
+    """Scores for several headlines from one Ollama prompt; None where no score came back"""
+    numbered = '\n'.join(f'{i}. "{headline}"' for i, headline in enumerate(headlines, 1))
+    payload = {
+        "model": OLLAMA_MODEL,
+        "prompt": BATCH_SENTIMENT_PROMPT.format(headlines=numbered),
+        "stream": False,
+        "options": {"temperature": 0.1, "num_predict": 10 * len(headlines) + 10, "num_ctx": OLLAMA_NUM_CTX}
+    }
     
-    strong_neg = ['crash', 'plunge', 'collapse', 'tank', 'disaster', 'crisis', 'bankruptcy', 'fraud', 'scandal']
-    neg = ['fall', 'drop', 'down', 'decline', 'sink', 'bearish', 'loss', 'miss', 'cut', 'downgrade', 'sell', 'weak', 'warning', 'risk', 'fear', 'layoff', 'recession', 'debt', 'lawsuit', 'lower', 'decrease', 'slowdown']
+    scores = [None] * len(headlines)
+    try:
+        resp = _SESSION.post(OLLAMA_URL, json=payload, timeout=timeout)
+        resp.raise_for_status()
+        response_text = resp.json().get('response', '')
+    except Exception:
+        return scores
     
+    for number, value in BATCH_SCORE_RE.findall(response_text):
+        i = int(number) - 1
+        if 0 <= i < len(scores) and scores[i] is None:
+            scores[i] = max(min(float(value), 1.0), -1.0)
+    return scores
+
+
+_PUNCT_RE = re.compile(r'[^\w\s]')
+
+def normalize_headline(text):
+    """Lowercase, drop punctuation, collapse whitespace"""
+    return ' '.join(_PUNCT_RE.sub(' ', text.lower()).split())
+
+
+def ollama_embedding(text, timeout=20):
+    """Unit-length embedding of text from Ollama, or None"""
+    try:
+        resp = _SESSION.post(OLLAMA_EMBED_URL, json={"model": EMBED_MODEL, "input": text}, timeout=timeout)
+        resp.raise_for_status()
+        vec = np.asarray(resp.json()['embeddings'][0], dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else None
+    except Exception:
+        return None
+
+
+class SentimentCache:
+    """
+    Ollama sentiment scores from earlier runs, per model.
+    Loaded once per harvest; new scores are buffered and written by save().
+    """
+    def __init__(self, path=SENTIMENT_CACHE_FILE):
+        self.path = path
+        self.exact = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.matrix_scores = np.zeros(0, dtype=np.float64)
+        self.matrix_titles = []
+        self.new_rows = []
+        self.lock = threading.Lock()
+        
+        if not os.path.exists(path):
+            return
+        cutoff = (datetime.now() - timedelta(days=SENTIMENT_CACHE_DAYS)).isoformat()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT norm_title, score, embed_model, embedding FROM title_scores "
+                "WHERE model = ? AND ts >= ?", (OLLAMA_MODEL, cutoff)
+            ).fetchall()
+        finally:
+            conn.close()
+        
+        self.exact = {norm: score for norm, score, _, _ in rows}
+        # Only vectors from the current embedding model are comparable
+        with_vec = [(norm, score, blob) for norm, score, embed_model, blob in rows
+                    if blob and embed_model == EMBED_MODEL]
+        if with_vec:
+            self.matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in with_vec])
+            self.matrix_scores = np.array([score for _, score, _ in with_vec])
+            self.matrix_titles = [norm for norm, _, _ in with_vec]
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS title_scores (
+            norm_title TEXT, model TEXT, score REAL, embed_model TEXT, embedding BLOB, ts TEXT,
+            PRIMARY KEY (norm_title, model))""")
+        return conn
+    
+    def lookup(self, headline):
+        """(cached score or None, normalized title, its embedding if one was fetched)"""
+        norm = normalize_headline(headline)
+        if norm in self.exact:
+            return self.exact[norm], norm, None
+        
+        vec = ollama_embedding(norm) if len(self.matrix) else None
+        if vec is not None and vec.shape[0] == self.matrix.shape[1]:
+            sims = self.matrix @ vec
+            best = int(np.argmax(sims))
+            # Near-twins like "shares rise" / "shares fall" embed closely; only reuse
+            # the score when both titles hit the same sentiment keywords
+            if (sims[best] > SIMILARITY_THRESHOLD and
+                    keyword_weights(norm) == keyword_weights(self.matrix_titles[best])):
+                return float(self.matrix_scores[best]), norm, vec
+        return None, norm, vec
+    
+    def remember(self, norm, score, vec=None):
+        """Buffer a freshly generated score for save()"""
+        if vec is None:
+            vec = ollama_embedding(norm)
+        with self.lock:
+            self.exact[norm] = score
+            self.new_rows.append((norm, score, vec))
+    
+    def score(self, headline):
+        """Cached or freshly generated Ollama score for a headline; None if Ollama fails"""
+        score, norm, vec = self.lookup(headline)
+        if score is not None:
+            return score
+        
+        score = ollama_sentiment(headline)
+        if score is not None:
+            self.remember(norm, score, vec)
+        return score
+    
+    def save(self):
+        """Persist the scores generated during this run and drop expired ones"""
+        if not self.new_rows:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        now = datetime.now()
+        stamp = now.isoformat()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO title_scores VALUES (?, ?, ?, ?, ?, ?)",
+                    [(norm, OLLAMA_MODEL, score, EMBED_MODEL, vec.tobytes() if vec is not None else None, stamp)
+                     for norm, score, vec in self.new_rows]
+                )
+                conn.execute("DELETE FROM title_scores WHERE ts < ?",
+                             ((now - timedelta(days=SENTIMENT_CACHE_DAYS)).isoformat(),))
+        finally:
+            conn.close()
+        self.new_rows = []
+
+
+# Fallback keyword lists and their weights
+STRONG_POSITIVE = ['surge', 'soar', 'skyrocket', 'boom', 'record high', 'beat expectations', 'blowout']
+POSITIVE = ['rise', 'gain', 'up', 'jump', 'rally', 'climb', 'bullish', 'growth', 'profit', 'beat', 'upgrade', 'buy', 'strong', 'expand', 'boost', 'positive', 'higher', 'increase', 'breakthrough', 'deal', 'partnership', 'launch']
+STRONG_NEGATIVE = ['crash', 'plunge', 'collapse', 'tank', 'disaster', 'crisis', 'bankruptcy', 'fraud', 'scandal']
+NEGATIVE = ['fall', 'drop', 'down', 'decline', 'sink', 'bearish', 'loss', 'miss', 'cut', 'downgrade', 'sell', 'weak', 'warning', 'risk', 'fear', 'layoff', 'recession', 'debt', 'lawsuit', 'lower', 'decrease', 'slowdown']
+
+KEYWORD_TERMS = (
+    [(w, 0.4) for w in STRONG_POSITIVE] + [(w, 0.15) for w in POSITIVE] +
+    [(w, -0.4) for w in STRONG_NEGATIVE] + [(w, -0.15) for w in NEGATIVE]
+)
+
+def _build_keyword_automaton():
+    """One Aho-Corasick automaton over all fallback keywords; values are (order, weight)"""
+    automaton = ahocorasick.Automaton()
+    for order, (word, weight) in enumerate(KEYWORD_TERMS):
+        automaton.add_word(word, (order, weight))
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton() if ahocorasick is not None else None
+
+def keyword_weights(text_lower):
+    """Weights of the keywords found in text_lower, each keyword once, in list order"""
+    if _KEYWORD_AUTOMATON is not None:
+        # Single scan instead of one substring test per keyword
+        return [weight for _, weight in sorted({hit for _, hit in _KEYWORD_AUTOMATON.iter(text_lower)})]
+    return [weight for word, weight in KEYWORD_TERMS if word in text_lower]
+
+
+def keyword_sentiment(text):
+    """Fallback keyword-based sentiment"""
     score = 0
-    for w in strong_pos:
-        if w in text_lower: score += 0.4
-    for w in pos:
-        if w in text_lower: score += 0.15
-    for w in strong_neg:
-        if w in text_lower: score -= 0.4
-    for w in neg:
-        if w in text_lower: score -= 0.15
+    for weight in keyword_weights(text.lower()):
+        score += weight
     
     return max(min(score, 1.0), -1.0)
 
 
-def analyze_headlines_ollama(headlines, max_workers=3):
-    """Batch analyze headlines with Ollama (parallel but careful with resources)"""
-    print(f"🧠 Analyzing {len(headlines)} headlines with Ollama ({OLLAMA_MODEL})...")
-    
-    results = {}
-    failed = 0
+def confident_keyword_score(text):
+    """
+    Keyword score when it is decisive enough to skip the LLM: no keywords at all (0),
+    or |score| >= KEYWORD_CONFIDENT_SCORE. None for the ambiguous middle.
+    """
+    weights = keyword_weights(text.lower())
+    if not weights:
+        return 0
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_idx = {
-            executor.submit(ollama_sentiment, hl['title']): i 
-            for i, hl in enumerate(headlines)
-        }
+    score = 0
+    for weight in weights:
+        score += weight
+    score = max(min(score, 1.0), -1.0)
+    return score if abs(score) >= KEYWORD_CONFIDENT_SCORE else None
+
+
+async def analyze_headlines_ollama_async(headlines, cache, max_concurrent=OLLAMA_CONCURRENCY,
+                                        batch_size=OLLAMA_BATCH_SIZE):
+    """
+    Score headlines in place with at most max_concurrent Ollama calls in flight; returns the fallback count.
+    Cache misses are scored batch_size headlines per prompt; any the batch answer skips are asked singly.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+    progress = {'done': 0, 'failed': 0}
+    
+    def finish(hl, score):
+        if score is not None:
+            hl['sentiment'] = round(score, 2)
+            hl['sentiment_source'] = 'ollama'
+        else:
+            # Fallback to keyword
+            hl['sentiment'] = round(keyword_sentiment(hl['title']), 2)
+            hl['sentiment_source'] = 'keyword'
+            progress['failed'] += 1
         
-        done = 0
-        for future in as_completed(future_to_idx):
-            idx = future_to_idx[future]
+        progress['done'] += 1
+        if progress['done'] % 50 == 0:
+            print(f"   Progress: {progress['done']}/{len(headlines)} ({progress['failed']} fallbacks)")
+    
+    async def call(fn, *args):
+        async with semaphore:
             try:
-                score = future.result()
-                if score is not None:
-                    headlines[idx]['sentiment'] = round(score, 2)
-                    headlines[idx]['sentiment_source'] = 'ollama'
-                else:
-                    # Fallback to keyword
-                    headlines[idx]['sentiment'] = round(keyword_sentiment(headlines[idx]['title']), 2)
-                    headlines[idx]['sentiment_source'] = 'keyword'
-                    failed += 1
+                return await asyncio.to_thread(fn, *args)
             except Exception:
-                headlines[idx]['sentiment'] = round(keyword_sentiment(headlines[idx]['title']), 2)
-                headlines[idx]['sentiment_source'] = 'keyword'
-                failed += 1
-            
-            done += 1
-            if done % 50 == 0:
-                print(f"   Progress: {done}/{len(headlines)} ({failed} fallbacks)")
-    
-    print(f"   ✓ Done. {len(headlines) - failed} Ollama, {failed} keyword fallback")
-    return headlines
+                return None
+    
+    async def lookup(hl):
+        found = await call(cache.lookup, hl['title'])
+        if found is None:
+            return hl, None, normalize_headline(hl['title']), None
+        return (hl, *found)
+    
+    misses = []
+    for hl, score, norm, vec in await asyncio.gather(*(lookup(hl) for hl in headlines)):
+        if score is not None:
+            finish(hl, score)
+        else:
+            misses.append((hl, norm, vec))
+    
+    async def analyze_batch(batch):
+        scores = await call(ollama_sentiment_batch, [hl['title'] for hl, _, _ in batch])
+        for (hl, norm, vec), score in zip(batch, scores or [None] * len(batch)):
+            if score is None:
+                score = await call(ollama_sentiment, hl['title'])
+            if score is not None:
+                await call(cache.remember, norm, score, vec)
+            finish(hl, score)
+    
+    await asyncio.gather(*(analyze_batch(misses[i:i + batch_size])
+                           for i in range(0, len(misses), batch_size)))
+    return progress['failed']
 
 
-def classify_sectors(headline, sectors):
-    """Classify headline into sectors"""
-    title_lower = headline['title'].lower()
-    matched = []
-    
-    for sector_code, sector_info in sectors.items():
-        for keyword in sector_info.get('keywords', []):
-            if keyword.lower() in title_lower:
-                matched.append(sector_code)
-                break
+def analyze_headlines_ollama(headlines, max_concurrent=OLLAMA_CONCURRENCY):
+    """Batch analyze headlines with Ollama (parallel but careful with resources)"""
+    print(f"🧠 Analyzing {len(headlines)} headlines with Ollama ({OLLAMA_MODEL})...")
     
-    return matched if matched else ['general']
+    # Headlines the keywords already settle never reach the LLM
+    ambiguous = []
+    for hl in headlines:
+        score = confident_keyword_score(hl['title'])
+        if score is None:
+            ambiguous.append(hl)
+        else:
+            hl['sentiment'] = round(score, 2)
+            hl['sentiment_source'] = 'keyword_confident'
+    skipped = len(headlines) - len(ambiguous)
+    
+    cache = SentimentCache()
+    failed = asyncio.run(analyze_headlines_ollama_async(ambiguous, cache, max_concurrent))
+    
+    cache.save()
+    print(f"   ✓ Done. {len(ambiguous) - failed} Ollama, {failed} keyword fallback, {skipped} keyword confident")
+    return headlines
 
 
 def aggregate_sentiment(headlines, sectors):
     """Aggregate sentiment per sector"""
-    sector_data = {code: {'headlines': [], 'scores': []} for code in sectors.keys()}
-    sector_data['general'] = {'headlines': [], 'scores': []}
-    
-    for hl in headlines:
-        sentiment = hl.get('sentiment', 0)
+    codes = list(dict.fromkeys([*sectors, 'general']))
+    code_index = {code: i for i, code in enumerate(codes)}
+    
+    # Structure of arrays: one score per headline, one (headline, sector) row per membership
+    sentiments = [hl.get('sentiment', 0) for hl in headlines]
+    pair_headline = []
+    pair_sector = []
+    for i, hl in enumerate(headlines):
         for sector in hl.get('sectors', ['general']):
-            if sector in sector_data:
-                sector_data[sector]['headlines'].append(hl)
-                sector_data[sector]['scores'].append(sentiment)
+            j = code_index.get(sector)
+            if j is not None:
+                pair_headline.append(i)
+                pair_sector.append(j)
+    
+    scores = np.array(sentiments, dtype=np.float64)
+    pair_headline = np.array(pair_headline, dtype=np.intp)
+    pair_sector = np.array(pair_sector, dtype=np.intp)
+    
+    # bincount adds in input order, so the sums match a sequential Python sum
+    counts = np.bincount(pair_sector, minlength=len(codes))
+    sums = np.bincount(pair_sector, weights=scores[pair_headline], minlength=len(codes)).tolist()
+    
+    # Group rows by sector, strongest first; lexsort is stable so ties keep headline order
+    order = np.lexsort((-np.abs(scores)[pair_headline], pair_sector))
+    rank = np.arange(len(order)) - np.repeat(np.cumsum(counts) - counts, counts)
+    top = pair_headline[order[rank < 5]].tolist()
+    top_counts = np.minimum(counts, 5).tolist()
     
     results = {}
-    for sector, data in sector_data.items():
-        if data['scores']:
-            avg = sum(data['scores']) / len(data['scores'])
-            top = sorted(data['headlines'], key=lambda x: abs(x.get('sentiment', 0)), reverse=True)[:5]
-            results[sector] = {
-                'score': round(avg, 3),
-                'count': len(data['scores']),
-                'signal': 'BUY' if avg > 0.25 else ('SELL' if avg < -0.25 else 'HOLD'),
-                'top_positive': [h['title'][:80] for h in top if h.get('sentiment', 0) > 0][:2],
-                'top_negative': [h['title'][:80] for h in top if h.get('sentiment', 0) < 0][:2]
-            }
+    start = 0
+    for j, (sector, count) in enumerate(zip(codes, counts.tolist())):
+        if not count:
+            continue
+        top_idx = top[start:start + top_counts[j]]
+        start += top_counts[j]
+        
+        avg = sums[j] / count
+        results[sector] = {
+            'score': round(avg, 3),
+            'count': count,
+            'signal': 'BUY' if avg > 0.25 else ('SELL' if avg < -0.25 else 'HOLD'),
+            'top_positive': [headlines[i]['title'][:80] for i in top_idx if sentiments[i] > 0][:2],
+            'top_negative': [headlines[i]['title'][:80] for i in top_idx if sentiments[i] < 0][:2]
+        }
     
     return results
 
@@ -267,10 +522,11 @@ def harvest_all(verbose=True):
     config = load_config()
     all_headlines = []
     stats = {'rss_success': 0, 'rss_fail': 0, 'web_success': 0, 'web_fail': 0}
+    now = datetime.now()  # One clock reading names and stamps the whole harvest
     
     if verbose:
         print(f"\n{'='*70}")
-        print(f"📰 NEWS HARVESTER v4.0 + OLLAMA - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        print(f"📰 NEWS HARVESTER v4.0 + OLLAMA - {now.strftime('%Y-%m-%d %H:%M')}")
         print(f"{'='*70}\n")
     
     # Collect RSS feeds
@@ -320,11 +576,12 @@ def harvest_all(verbose=True):
         if verbose:
             print(f"   ✓ Web: {stats['web_success']} ok, {stats['web_fail']} failed")
     
-    # Deduplicate
+    # Deduplicate on a fingerprint of the first 50 chars of the normalized title
+    # (case, punctuation and whitespace variants collapse; only compared in-process)
     seen = set()
     unique = []
     for hl in all_headlines:
-        key = hl['title'][:50].lower()
+        key = hash(normalize_headline(hl['title'])[:50])
         if key not in seen:
             seen.add(key)
             unique.append(hl)
@@ -334,8 +591,9 @@ def harvest_all(verbose=True):
     
     # Sector classification
     sectors = config.get('us_sectors', {})
+    sector_automaton = build_sector_automaton(sectors)
     for hl in unique:
-        hl['sectors'] = classify_sectors(hl, sectors)
+        hl['sectors'] = classify_sectors(hl, sectors, sector_automaton)
     
     # Sentiment analysis (Ollama or keyword)
     if USE_OLLAMA:
@@ -351,8 +609,9 @@ def harvest_all(verbose=True):
     
     # Build report
     ollama_count = sum(1 for h in unique if h.get('sentiment_source') == 'ollama')
+    confident_count = sum(1 for h in unique if h.get('sentiment_source') == 'keyword_confident')
     report = {
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': now.isoformat(),
         'stats': {
             'total_headlines': len(unique),
             'rss_feeds_success': stats['rss_success'],
@@ -361,7 +620,8 @@ def harvest_all(verbose=True):
             'web_scrape_failed': stats['web_fail'],
             'sources_total': stats['rss_success'] + stats['web_success'],
             'ollama_analyzed': ollama_count,
-            'keyword_fallback': len(unique) - ollama_count
+            'keyword_confident': confident_count,
+            'keyword_fallback': len(unique) - ollama_count - confident_count
         },
         'sector_sentiment': sector_sentiment,
         'rankings': {
@@ -373,19 +633,19 @@ def harvest_all(verbose=True):
     
     # Save
     os.makedirs(DATA_DIR, exist_ok=True)
-    today = datetime.now().strftime('%Y-%m-%d')
-    hour = datetime.now().strftime('%H')
+    today = now.strftime('%Y-%m-%d')
+    hour = now.strftime('%H')
     
     harvest_dir = os.path.join(DATA_DIR, 'harvests', today)
     os.makedirs(harvest_dir, exist_ok=True)
     
-    output_file = os.path.join(harvest_dir, f'harvest_{hour}00.json')
-    with open(output_file, 'w') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    # Serialized once; the hourly archive is gzipped, latest stays plain for readers
+    payload = dump_json(report)
+    output_file = os.path.join(harvest_dir, f'harvest_{hour}00.json.gz')
+    write_atomic(output_file, gzip.compress(payload, compresslevel=3))
     
     latest_file = os.path.join(DATA_DIR, 'latest_harvest.json')
-    with open(latest_file, 'w') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    write_atomic(latest_file, payload)
     
     if verbose:
         print(f"\n{'='*70}")
@@ -10,11 +10,22 @@ Maintains:
 - Learning progress
 """
 
+import atexit
 import json
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Fall back to a plain loop over the returns
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # History records are then encoded and parsed with json
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 HISTORY_DIR = os.path.join(DATA_DIR, "history")
@@ -32,31 +43,69 @@ def ensure_dirs():
     os.makedirs(HISTORY_DIR, exist_ok=True)
 
 
+# Open append handles per path, line-buffered so every record is on disk once written
+_WRITERS: Dict[str, object] = {}
+
+
+def _dumps(data: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data)
+
+
+@atexit.register
+def close_writers():
+    """Close all JSONL append handles."""
+    for writer in _WRITERS.values():
+        writer.close()
+    _WRITERS.clear()
+
+
 def append_jsonl(path: str, data: dict):
     """Append a record to a JSONL file."""
-    ensure_dirs()
-    with open(path, 'a') as f:
-        f.write(json.dumps(data) + "\n")
+    writer = _WRITERS.get(path)
+    if writer is None:
+        ensure_dirs()
+        writer = _WRITERS[path] = open(path, 'a', buffering=1, encoding='utf-8')
+    writer.write(_dumps(data) + "\n")
+
+
+# Parsed records per path, keyed on (mtime, size) so an appended file is re-read
+_JSONL_CACHE: Dict[str, tuple] = {}
+
+
+def _load_jsonl(path: str) -> Optional[List[dict]]:
+    """All records in a JSONL file, parsed once per file version; None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _JSONL_CACHE.get(path)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, 'rb') as f:
+        records = [loads(line) for line in f if line.strip()]
+    _JSONL_CACHE[path] = (key, records)
+    return records
 
 
 def read_jsonl(path: str, days: int = None) -> List[dict]:
     """Read records from JSONL, optionally filtered by days."""
-    if not os.path.exists(path):
+    records = _load_jsonl(path)
+    if records is None:
         return []
     
-    records = []
     cutoff = None
     if days:
         cutoff = (datetime.now() - timedelta(days=days)).isoformat()
     
-    with open(path, 'r') as f:
-        for line in f:
-            if line.strip():
-                record = json.loads(line)
-                if cutoff and record.get("date", record.get("timestamp", "")) < cutoff:
-                    continue
-                records.append(record)
-    return records
+    # Shallow copies, so callers can annotate records without touching the cache
+    return [dict(record) for record in records
+            if not (cutoff and record.get("date", record.get("timestamp", "")) < cutoff)]
 
 
 # =============================================================================
@@ -64,7 +113,7 @@ def read_jsonl(path: str, days: int = None) -> List[dict]:
 # =============================================================================
 
 def save_portfolio_snapshot(scenario: str, holdings: Dict[str, dict], total_value: float, 
-                           cash: float = 0, notes: str = ""):
+                           cash: float = 0, notes: str = "", now: datetime = None):
     """
     Save a daily portfolio snapshot.
     
@@ -74,10 +123,12 @@ def save_portfolio_snapshot(scenario: str, holdings: Dict[str, dict], total_valu
         total_value: Total portfolio value
         cash: Cash position
         notes: Any notes
+        now: Time to record (default: current time)
     """
+    now = now or datetime.now()
     snapshot = {
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "timestamp": datetime.now().isoformat(),
+        "date": now.strftime("%Y-%m-%d"),
+        "timestamp": now.isoformat(),
         "scenario": scenario,
         "total_value": total_value,
         "cash": cash,
@@ -102,7 +153,8 @@ def get_portfolio_history(scenario: str = None, days: int = 30) -> List[dict]:
 # =============================================================================
 
 def save_daily_performance(scenario: str, date: str, start_value: float, end_value: float,
-                          benchmark_return: float = None, sectors_performance: dict = None):
+                          benchmark_return: float = None, sectors_performance: dict = None,
+                          now: datetime = None):
     """
     Save daily performance metrics.
     
@@ -113,12 +165,13 @@ def save_daily_performance(scenario: str, date: str, start_value: float, end_val
         end_value: Portfolio value at end of day
         benchmark_return: SPY return for comparison
         sectors_performance: {sector: return_pct}
+        now: Time to record (default: current time)
     """
     daily_return = (end_value - start_value) / start_value * 100 if start_value > 0 else 0
     
     record = {
         "date": date,
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": (now or datetime.now()).isoformat(),
         "scenario": scenario,
         "start_value": start_value,
         "end_value": end_value,
@@ -141,22 +194,35 @@ def get_performance_history(scenario: str = None, days: int = 30) -> List[dict]:
 
 def calculate_cumulative_returns(scenario: str = None, days: int = 30) -> dict:
     """Calculate cumulative returns over period."""
-    records = get_performance_history(scenario, days)
+    return cumulative_returns(get_performance_history(scenario, days))
+
+
+def cumulative_returns(records: List[dict]) -> dict:
+    """Cumulative return statistics over already-loaded performance records."""
     if not records:
         return {"total_return": 0, "days": 0, "avg_daily": 0}
     
-    total_return = 1.0
-    for r in records:
-        total_return *= (1 + r.get("daily_return_pct", 0) / 100)
-    
-    total_return_pct = (total_return - 1) * 100
+    daily = [r.get("daily_return_pct", 0) for r in records]
+    if np is not None:
+        returns = np.array(daily, dtype=np.float64)
+        total_return_pct = float((np.prod(1 + returns / 100) - 1) * 100)
+        # argmax/argmin pick the first extreme, as max()/min() do; report the stored value
+        best_day = daily[int(returns.argmax())]
+        worst_day = daily[int(returns.argmin())]
+    else:
+        total_return = 1.0
+        for pct in daily:
+            total_return *= (1 + pct / 100)
+        total_return_pct = (total_return - 1) * 100
+        best_day = max(daily)
+        worst_day = min(daily)
     
     return {
         "total_return_pct": round(total_return_pct, 2),
         "days": len(records),
-        "avg_daily_pct": round(total_return_pct / len(records), 3) if records else 0,
-        "best_day": max(r.get("daily_return_pct", 0) for r in records) if records else 0,
-        "worst_day": min(r.get("daily_return_pct", 0) for r in records) if records else 0
+        "avg_daily_pct": round(total_return_pct / len(records), 3),
+        "best_day": best_day,
+        "worst_day": worst_day
     }
 
 
@@ -165,7 +231,8 @@ def calculate_cumulative_returns(scenario: str = None, days: int = 30) -> dict:
 # =============================================================================
 
 def save_daily_sentiment(date: str, sector_sentiments: Dict[str, float], 
-                        overall_sentiment: float = None, news_count: int = 0):
+                        overall_sentiment: float = None, news_count: int = 0,
+                        now: datetime = None):
     """
     Save daily sentiment readings.
     
@@ -174,13 +241,14 @@ def save_daily_sentiment(date: str, sector_sentiments: Dict[str, float],
         sector_sentiments: {sector: sentiment_score}
         overall_sentiment: Weighted average
         news_count: Number of news items analyzed
+        now: Time to record (default: current time)
     """
     if overall_sentiment is None and sector_sentiments:
         overall_sentiment = sum(sector_sentiments.values()) / len(sector_sentiments)
     
     record = {
         "date": date,
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": (now or datetime.now()).isoformat(),
         "overall": round(overall_sentiment or 0, 3),
         "news_count": news_count,
         "sectors": {k: round(v, 3) for k, v in sector_sentiments.items()}
@@ -229,7 +297,7 @@ def get_sentiment_trend(sector: str, days: int = 7) -> dict:
 # =============================================================================
 
 def save_trade(scenario: str, action: str, ticker: str, shares: float, price: float,
-              reason: str = "", sentiment: float = None):
+              reason: str = "", sentiment: float = None, now: datetime = None):
     """
     Save a trade execution.
     
@@ -241,10 +309,12 @@ def save_trade(scenario: str, action: str, ticker: str, shares: float, price: fl
         price: Execution price
         reason: Why this trade
         sentiment: Sentiment at time of trade
+        now: Time to record (default: current time)
     """
+    now = now or datetime.now()
     trade = {
-        "timestamp": datetime.now().isoformat(),
-        "date": datetime.now().strftime("%Y-%m-%d"),
+        "timestamp": now.isoformat(),
+        "date": now.strftime("%Y-%m-%d"),
         "scenario": scenario,
         "action": action,
         "ticker": ticker,
@@ -274,13 +344,14 @@ def get_trade_history(scenario: str = None, ticker: str = None, days: int = 30)
 
 def save_learning_progress(embeddings_count: int, knowledge_topics: int, 
                           prompt_accuracy: float = None, decisions_evaluated: int = 0,
-                          win_rate: float = None):
+                          win_rate: float = None, now: datetime = None):
     """
     Save learning progress snapshot.
     """
+    now = now or datetime.now()
     record = {
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "timestamp": datetime.now().isoformat(),
+        "date": now.strftime("%Y-%m-%d"),
+        "timestamp": now.isoformat(),
         "embeddings_count": embeddings_count,
         "knowledge_topics": knowledge_topics,
         "prompt_accuracy": prompt_accuracy,
@@ -307,12 +378,14 @@ def generate_history_summary(days: int = 7) -> dict:
         "generated": datetime.now().isoformat()
     }
     
-    # Performance
+    # Performance: each file is read once, then split per scenario in memory
     perf = get_performance_history(days=days)
     if perf:
-        scenarios = set(r.get("scenario") for r in perf)
+        by_scenario: Dict[str, List[dict]] = {}
+        for r in perf:
+            by_scenario.setdefault(r.get("scenario"), []).append(r)
         summary["performance"] = {
-            s: calculate_cumulative_returns(s, days) for s in scenarios
+            s: cumulative_returns(records) for s, records in by_scenario.items()
         }
     
     # Sentiment
@@ -11,6 +11,8 @@ Bronnen:
 Output: data/knowledge_base.jsonl
 """
 
+import asyncio
+import atexit
 import json
 import os
 import re
@@ -18,8 +20,8 @@ import hashlib
 from datetime import datetime, timedelta
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse, urljoin
-import time
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
@@ -33,7 +35,42 @@ OLLAMA_URL = "http://localhost:11434/api/generate"
 ANALYSIS_MODEL = "llama3.1:8b"  # Complexer model voor kennis extractie
 
 # Rate limiting
-REQUEST_DELAY = 2.0  # Seconds between requests (be polite)
+REQUEST_DELAY = 2.0  # Seconds between requests to the same host (be polite)
+HOST_CONCURRENCY = 2  # Requests in flight per host
+OLLAMA_CONCURRENCY = 2  # Article analyses in flight at once
+ARTICLE_BATCH_SIZE = 5  # Articles analysed per Ollama prompt
+BATCH_TEXT_CHARS = 3000  # Per-article excerpt in a batch prompt
+ANALYSIS_NUM_CTX = 8192  # Five 3000-char excerpts plus answers; single-article analyses reuse it to avoid a reload
+INSIGHT_PREDICT_TOKENS = 600  # Answer budget per article in a batch prompt
+
+# Blocks dropped before tag stripping, applied in this order
+BLOCK_TAGS = ("script", "style", "nav", "footer", "header")
+STRIP_BLOCK_RES = [
+    re.compile(rf'<{tag}[^>]*>.*?</{tag}>', re.DOTALL | re.IGNORECASE)
+    for tag in BLOCK_TAGS
+]
+TAG_RE = re.compile(r'<[^>]+>')
+JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
+JSON_ARRAY_RE = re.compile(r'\[[\s\S]*\]')
+CONTENT_HASH_RE = re.compile(r'"content_hash":\s*"([^"]*)"')
+HASH_KEY_MASK = 0xFFFF_FFFF_FFFF_FFFF  # Low 64 bits of the MD5 are kept for dedupe
+
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) Knowledge Research Bot",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9,nl;q=0.8"
+}
+FETCH_POOL_HOSTS = 16  # Hosts whose keep-alive connections are kept around
+
+# Keep-alive connections for source pages, so each host is handshaken once per run
+_SESSION = requests.Session()
+_SESSION.headers.update(FETCH_HEADERS)
+_SESSION.mount('http://', HTTPAdapter(pool_connections=FETCH_POOL_HOSTS, pool_maxsize=HOST_CONCURRENCY))
+_SESSION.mount('https://', HTTPAdapter(pool_connections=FETCH_POOL_HOSTS, pool_maxsize=HOST_CONCURRENCY))
+
+# Warm local socket to Ollama, shared by the analysis threads
+_OLLAMA_SESSION = requests.Session()
+_OLLAMA_SESSION.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_CONCURRENCY))
 
 
 def load_sources():
@@ -101,14 +138,8 @@ def get_default_sources():
 
 def fetch_url(url, timeout=30):
     """Fetch URL content with proper headers."""
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) Knowledge Research Bot",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.9,nl;q=0.8"
-    }
-    
     try:
-        response = requests.get(url, headers=headers, timeout=timeout)
+        response = _SESSION.get(url, timeout=timeout)
         response.raise_for_status()
         return response.text
     except Exception as e:
@@ -116,24 +147,51 @@ def fetch_url(url, timeout=30):
         return None
 
 
+def _strip_block(html, lower, tag):
+    """
+    Drop every <tag ...>...</tag> block with str.find jumps over a lowercased copy;
+    same result as the STRIP_BLOCK_RES pattern for that tag.
+    """
+    opener, closer = "<" + tag, "</" + tag + ">"
+    parts = []
+    pos = 0
+    while True:
+        start = lower.find(opener, pos)
+        if start == -1:
+            break
+        gt = lower.find(">", start)
+        if gt == -1:
+            break
+        end = lower.find(closer, gt + 1)
+        if end == -1:
+            break
+        parts.append(html[pos:start])
+        pos = end + len(closer)
+    
+    if not parts:
+        return html, lower
+    parts.append(html[pos:])
+    html = "".join(parts)
+    return html, html.lower()
+
+
 def extract_text_from_html(html):
     """Extract readable text from HTML (simple version)."""
     if not html:
         return ""
     
     # Remove scripts, styles, etc.
-    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r'<nav[^>]*>.*?</nav>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r'<footer[^>]*>.*?</footer>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r'<header[^>]*>.*?</header>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    
-    # Remove HTML tags
-    text = re.sub(r'<[^>]+>', ' ', html)
-    
-    # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text)
-    text = text.strip()
+    lower = html.lower()
+    if len(lower) == len(html):
+        for tag in BLOCK_TAGS:
+            html, lower = _strip_block(html, lower, tag)
+    else:
+        # Lowercasing changed the length (e.g. 'İ'), so offsets would not line up
+        for block_re in STRIP_BLOCK_RES:
+            html = block_re.sub('', html)
+    
+    # Remove HTML tags and collapse whitespace
+    text = " ".join(TAG_RE.sub(' ', html).split())
     
     # Limit length
     if len(text) > 15000:
@@ -142,51 +200,54 @@ def extract_text_from_html(html):
     return text
 
 
-def extract_insights_with_ollama(text, source_name, source_url):
-    """Use Ollama to extract trading/sentiment insights from text."""
-    
-    prompt = f"""Analyze this article about trading and news sentiment. Extract actionable insights.
-
-Source: {source_name}
-URL: {source_url}
-
-Text:
-{text[:8000]}
-
-Extract the following in JSON format:
-{{
+INSIGHT_SCHEMA = """{
     "key_insights": [
         "insight 1 about news-trading relationship",
         "insight 2 about sentiment indicators",
         ...
     ],
     "sentiment_signals": [
-        {{
+        {
             "signal": "specific word or pattern",
             "meaning": "what it indicates (bullish/bearish)",
             "confidence": "high/medium/low"
-        }}
+        }
     ],
     "timing_rules": [
         "rule about when news impacts prices"
     ],
-    "sector_specific": {{
+    "sector_specific": {
         "sector_name": ["relevant insight for this sector"]
-    }},
+    },
     "quality_score": 1-10,
     "summary": "one paragraph summary of main learnings"
-}}
+}"""
+
+
+def extract_insights_with_ollama(text, source_name, source_url):
+    """Use Ollama to extract trading/sentiment insights from text."""
+    
+    prompt = f"""Analyze this article about trading and news sentiment. Extract actionable insights.
+
+Source: {source_name}
+URL: {source_url}
+
+Text:
+{text[:8000]}
+
+Extract the following in JSON format:
+{INSIGHT_SCHEMA}
 
 Return ONLY valid JSON, no other text."""
 
     try:
-        response = requests.post(
+        response = _OLLAMA_SESSION.post(
             OLLAMA_URL,
             json={
                 "model": ANALYSIS_MODEL,
                 "prompt": prompt,
                 "stream": False,
-                "options": {"temperature": 0.3}
+                "options": {"temperature": 0.3, "num_ctx": ANALYSIS_NUM_CTX}
             },
             timeout=120
         )
@@ -194,7 +255,7 @@ Return ONLY valid JSON, no other text."""
         if response.status_code == 200:
             result = response.json().get("response", "")
             # Try to parse JSON from response
-            json_match = re.search(r'\{[\s\S]*\}', result)
+            json_match = JSON_OBJECT_RE.search(result)
             if json_match:
                 return json.loads(json_match.group())
         
@@ -204,45 +265,147 @@ Return ONLY valid JSON, no other text."""
         return None
 
 
+def extract_insights_batch(articles):
+    """
+    Insights for several fetched articles from one Ollama prompt, in input order;
+    None for any article the answer leaves out.
+    """
+    blocks = "\n\n".join(
+        f"### Article {i}\nSource: {article['source']['name']}\nURL: {article['source']['url']}\n\n"
+        f"Text:\n{article['text'][:BATCH_TEXT_CHARS]}"
+        for i, article in enumerate(articles, 1)
+    )
+    prompt = f"""Analyze these {len(articles)} articles about trading and news sentiment. Extract actionable insights from each.
+
+{blocks}
+
+For each article, extract the following in JSON format, plus an "idx" field with the article number:
+{INSIGHT_SCHEMA}
+
+Return ONLY a valid JSON array of {len(articles)} objects, one per article, no other text."""
+
+    results = [None] * len(articles)
+    try:
+        response = _OLLAMA_SESSION.post(
+            OLLAMA_URL,
+            json={
+                "model": ANALYSIS_MODEL,
+                "prompt": prompt,
+                "stream": False,
+                "options": {
+                    "temperature": 0.3,
+                    "num_ctx": ANALYSIS_NUM_CTX,
+                    "num_predict": INSIGHT_PREDICT_TOKENS * len(articles)
+                }
+            },
+            timeout=120 * len(articles)
+        )
+        
+        if response.status_code == 200:
+            result = response.json().get("response", "")
+            json_match = JSON_ARRAY_RE.search(result)
+            if json_match:
+                for item in json.loads(json_match.group()):
+                    if not isinstance(item, dict):
+                        continue
+                    idx = item.pop("idx", None)
+                    if isinstance(idx, str) and idx.isdigit():
+                        idx = int(idx)
+                    if isinstance(idx, int) and 1 <= idx <= len(articles) and results[idx - 1] is None:
+                        results[idx - 1] = item
+    except Exception as e:
+        print(f"  ⚠️ Ollama batch extraction failed: {e}")
+    
+    return results
+
+
 def content_hash(text):
     """Generate hash of content to avoid duplicates."""
     return hashlib.md5(text[:1000].encode()).hexdigest()
 
 
+def hash_key(hex_hash):
+    """64-bit int form of a content hash, as kept in the dedupe set; None if malformed."""
+    try:
+        return int(hex_hash, 16) & HASH_KEY_MASK
+    except ValueError:
+        return None
+
+
 def load_existing_hashes():
-    """Load hashes of already processed content."""
+    """Load keys (see hash_key) of already processed content (read once per harvest run)."""
     hashes = set()
     if KNOWLEDGE_FILE.exists():
         with open(KNOWLEDGE_FILE) as f:
             for line in f:
-                try:
-                    entry = json.loads(line)
-                    if "content_hash" in entry:
-                        hashes.add(entry["content_hash"])
-                except:
-                    pass
+                # Only the top-level content_hash is needed, and it is written before the
+                # insights; searching that prefix beats decoding the whole entry
+                cut = line.find('"insights":')
+                match = CONTENT_HASH_RE.search(line, 0, cut if cut != -1 else len(line))
+                if match:
+                    key = hash_key(match.group(1))
+                    if key is not None:
+                        hashes.add(key)
     return hashes
 
 
+# Append handles, opened once and kept for the process; line-buffered so readers see whole lines
+_APPEND_FILES = {}
+
+
+@atexit.register
+def close_append_files():
+    """Close the knowledge base and harvest log handles."""
+    for f in _APPEND_FILES.values():
+        f.close()
+    _APPEND_FILES.clear()
+
+
+def append_jsonl(path, entry):
+    """Append one compact JSON line to path through its shared handle."""
+    f = _APPEND_FILES.get(path)
+    if f is None:
+        DATA_DIR.mkdir(exist_ok=True)
+        f = _APPEND_FILES[path] = open(path, "a", buffering=1)
+    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
 def save_insight(insight_data):
     """Append insight to knowledge base."""
-    DATA_DIR.mkdir(exist_ok=True)
-    with open(KNOWLEDGE_FILE, "a") as f:
-        f.write(json.dumps(insight_data) + "\n")
+    append_jsonl(KNOWLEDGE_FILE, insight_data)
 
 
 def log_harvest(log_entry):
     """Log harvest activity."""
-    DATA_DIR.mkdir(exist_ok=True)
-    with open(HARVEST_LOG, "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+    append_jsonl(HARVEST_LOG, log_entry)
+
+
+class HarvestLimits:
+    """Per-run concurrency limits: one semaphore per host, one for Ollama."""
+    
+    def __init__(self):
+        self.hosts = {}
+        self.ollama = asyncio.Semaphore(OLLAMA_CONCURRENCY)
+    
+    def host(self, url):
+        netloc = urlparse(url).netloc
+        if netloc not in self.hosts:
+            self.hosts[netloc] = asyncio.Semaphore(HOST_CONCURRENCY)
+        return self.hosts[netloc]
+
+
+async def fetch_url_async(url, limits):
+    """fetch_url off the event loop, paced per host instead of globally."""
+    async with limits.host(url):
+        await asyncio.sleep(REQUEST_DELAY)
+        return await asyncio.to_thread(fetch_url, url)
 
 
-def harvest_article(source):
-    """Harvest and analyze a single article."""
+async def fetch_article(source, limits, existing_hashes):
+    """Fetch one article and return it for analysis, or None if unusable or already known."""
     print(f"  📖 Fetching: {source['name']}")
     
-    html = fetch_url(source["url"])
+    html = await fetch_url_async(source["url"], limits)
     if not html:
         return None
     
@@ -251,42 +414,68 @@ def harvest_article(source):
         print(f"    ⚠️ Too little content ({len(text)} chars)")
         return None
     
-    # Check for duplicate
-    existing_hashes = load_existing_hashes()
+    # Check for duplicate; claim the hash at once so a concurrent copy is skipped too
     hash_val = content_hash(text)
-    if hash_val in existing_hashes:
+    key = hash_key(hash_val)
+    if key in existing_hashes:
         print(f"    ⏭️ Already processed (duplicate)")
         return None
+    existing_hashes.add(key)
     
-    print(f"    🤖 Analyzing with Ollama...")
-    insights = extract_insights_with_ollama(text, source["name"], source["url"])
-    
-    if not insights:
-        print(f"    ⚠️ No insights extracted")
-        return None
-    
-    # Build knowledge entry
+    return {"source": source, "text": text, "hash": hash_val}
+
+
+def save_article_insights(article, insights):
+    """Build and save the knowledge entry for an analysed article."""
+    source = article["source"]
     entry = {
         "timestamp": datetime.now().isoformat(),
         "source_name": source["name"],
         "source_url": source["url"],
         "source_type": source.get("type", "article"),
-        "content_hash": hash_val,
+        "content_hash": article["hash"],
         "insights": insights,
-        "text_length": len(text)
+        "text_length": len(article["text"])
     }
     
     save_insight(entry)
-    print(f"    ✅ Saved {len(insights.get('key_insights', []))} insights")
-    
+    print(f"    ✅ {source['name']}: saved {len(insights.get('key_insights', []))} insights")
     return entry
 
 
-def harvest_index_page(source):
-    """Harvest links from an index page and process articles."""
+async def analyze_batch(batch, limits):
+    """Analyse a batch of fetched articles in one prompt; articles it skips are retried singly."""
+    print(f"    🤖 Analyzing {len(batch)} articles with Ollama...")
+    async with limits.ollama:
+        results = await asyncio.to_thread(extract_insights_batch, batch)
+    
+    entries = []
+    for article, insights in zip(batch, results):
+        if not insights:
+            source = article["source"]
+            async with limits.ollama:
+                insights = await asyncio.to_thread(
+                    extract_insights_with_ollama, article["text"], source["name"], source["url"]
+                )
+        if not insights:
+            print(f"    ⚠️ {article['source']['name']}: no insights extracted")
+            continue
+        entries.append(save_article_insights(article, insights))
+    return entries
+
+
+async def analyze_articles(articles, limits):
+    """Analyse fetched articles ARTICLE_BATCH_SIZE per prompt; returns the saved entries."""
+    batches = await asyncio.gather(*(analyze_batch(articles[i:i + ARTICLE_BATCH_SIZE], limits)
+                                     for i in range(0, len(articles), ARTICLE_BATCH_SIZE)))
+    return [entry for batch in batches for entry in batch]
+
+
+async def harvest_index_page(source, limits, existing_hashes):
+    """Harvest links from an index page and fetch its articles."""
     print(f"  📑 Scanning index: {source['name']}")
     
-    html = fetch_url(source["url"])
+    html = await fetch_url_async(source["url"], limits)
     if not html:
         return []
     
@@ -313,14 +502,10 @@ def harvest_index_page(source):
     
     print(f"    Found {len(articles)} article links")
     
-    results = []
-    for article in articles[:5]:  # Process max 5
-        time.sleep(REQUEST_DELAY)
-        result = harvest_article(article)
-        if result:
-            results.append(result)
-    
-    return results
+    # Fetch max 5; the host semaphore keeps this polite
+    results = await asyncio.gather(*(fetch_article(article, limits, existing_hashes)
+                                     for article in articles[:5]))
+    return [result for result in results if result]
 
 
 def compile_knowledge_summary():
@@ -360,6 +545,40 @@ def compile_knowledge_summary():
     }
 
 
+async def harvest_source(source, limits, existing_hashes):
+    """Fetched articles (not yet analysed) from one configured source."""
+    if source.get("type") == "index" or source.get("type") == "search_index":
+        return await harvest_index_page(source, limits, existing_hashes)
+    article = await fetch_article(source, limits, existing_hashes)
+    return [article] if article else []
+
+
+async def harvest_all_sources(sources):
+    """
+    Fetch every source concurrently, then analyse the new articles in batches;
+    returns (total insights, sources processed, errors).
+    """
+    limits = HarvestLimits()
+    existing_hashes = load_existing_hashes()
+    all_sources = [source for source_list in sources.values() for source in source_list]
+    results = await asyncio.gather(*(harvest_source(source, limits, existing_hashes) for source in all_sources),
+                                   return_exceptions=True)
+    
+    articles = []
+    processed = 0
+    errors = []
+    for source, result in zip(all_sources, results):
+        if isinstance(result, Exception):
+            print(f"  ❌ Error processing {source['name']}: {result}")
+            errors.append(str(result))
+        else:
+            articles.extend(result)
+            processed += 1
+    
+    entries = await analyze_articles(articles, limits)
+    return len(entries), processed, errors
+
+
 def run_harvest():
     """Run the full knowledge harvest."""
     print("=" * 60)
@@ -368,7 +587,6 @@ def run_harvest():
     print("=" * 60)
     
     sources = load_sources()
-    total_insights = 0
     
     harvest_log = {
         "timestamp": datetime.now().isoformat(),
@@ -377,28 +595,14 @@ def run_harvest():
         "errors": []
     }
     
-    # Process each category
+    # Process all categories at once, paced per host
     for category, source_list in sources.items():
-        print(f"\n📂 Category: {category}")
-        print("-" * 40)
-        
-        for source in source_list:
-            try:
-                time.sleep(REQUEST_DELAY)
-                
-                if source.get("type") == "index" or source.get("type") == "search_index":
-                    results = harvest_index_page(source)
-                    total_insights += len(results)
-                else:
-                    result = harvest_article(source)
-                    if result:
-                        total_insights += 1
-                
-                harvest_log["sources_processed"] += 1
-                
-            except Exception as e:
-                print(f"  ❌ Error processing {source['name']}: {e}")
-                harvest_log["errors"].append(str(e))
+        print(f"📂 Category: {category} ({len(source_list)} sources)")
+    print("-" * 40)
+    
+    total_insights, harvest_log["sources_processed"], harvest_log["errors"] = asyncio.run(
+        harvest_all_sources(sources)
+    )
     
     harvest_log["insights_extracted"] = total_insights
     log_harvest(harvest_log)
@@ -4,12 +4,22 @@ LLM-based Sentiment Analysis
 Prepares headlines for LLM analysis via agent
 """
 
+import hashlib
 import json
 import os
 from datetime import datetime
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Fall back to summing per sector in Python
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+def title_hash(title):
+    """Stable 64-bit key of a normalized title; unlike hash() it survives between runs"""
+    return int.from_bytes(hashlib.blake2b(title.strip().lower().encode(), digest_size=8).digest(), 'big')
+
 def prepare_for_llm_analysis(max_headlines=100):
     """
     Prepare headlines for LLM analysis
@@ -35,7 +45,8 @@ def prepare_for_llm_analysis(max_headlines=100):
         'timestamp': datetime.now().isoformat(),
         'count': len(to_analyze),
         'headlines': [
-            {'idx': i, 'source': h.get('source', '?'), 'title': h.get('title', '')}
+            {'idx': i, 'source': h.get('source', '?'), 'title': h.get('title', ''),
+             'title_hash': title_hash(h.get('title', ''))}
             for i, h in enumerate(to_analyze)
         ]
     }
@@ -61,13 +72,31 @@ def save_llm_results(results: list):
     
     headlines = harvest.get('headlines', [])
     
-    # Create lookup by title
-    title_to_result = {r.get('title', '')[:50]: r for r in results}
+    # Title hashes of the pending batch, so results that only echo their idx resolve too
+    pending_path = os.path.join(BASE_DIR, 'data', 'pending_llm_analysis.json')
+    pending_hashes = {}
+    if os.path.exists(pending_path):
+        with open(pending_path) as f:
+            pending_hashes = {p['idx']: p['title_hash'] for p in json.load(f).get('headlines', [])
+                              if 'title_hash' in p}
+    
+    # Create lookup by title hash: the pending row's for the echoed idx (what the prompt asks for),
+    # else an echoed hash only if it is one we handed out, else the echoed full title
+    known_hashes = set(pending_hashes.values())
+    title_to_result = {}
+    for r in results:
+        if r.get('idx') in pending_hashes:
+            key = pending_hashes[r['idx']]
+        elif r.get('title_hash') in known_hashes:
+            key = r['title_hash']
+        else:
+            key = title_hash(r.get('title', ''))
+        title_to_result[key] = r
     
     # Update headlines with LLM results
     updated = 0
     for h in headlines:
-        key = h.get('title', '')[:50]
+        key = title_hash(h.get('title', ''))
         if key in title_to_result:
             r = title_to_result[key]
             h['sentiment'] = r.get('sentiment', h.get('sentiment', 0))
@@ -75,26 +104,35 @@ def save_llm_results(results: list):
             h['llm_analyzed'] = True
             updated += 1
     
-    # Recalculate sector sentiment
-    sector_scores = {}
+    # Recalculate sector sentiment: one (sector code, score) pair per headline-sector match
+    codes = {}
+    pair_sector = []
+    pair_score = []
     for h in headlines:
         sent = h.get('sentiment', 0)
         for sector in h.get('sectors', ['general']):
-            if sector not in sector_scores:
-                sector_scores[sector] = {'scores': [], 'headlines': []}
-            sector_scores[sector]['scores'].append(sent)
-            sector_scores[sector]['headlines'].append(h)
+            pair_sector.append(codes.setdefault(sector, len(codes)))
+            pair_score.append(sent)
     
     # Aggregate
+    if np is not None:
+        counts = np.bincount(np.array(pair_sector, dtype=np.intp), minlength=len(codes)).tolist()
+        sums = np.bincount(np.array(pair_sector, dtype=np.intp),
+                           weights=np.array(pair_score, dtype=np.float64), minlength=len(codes)).tolist()
+    else:
+        counts = [0] * len(codes)
+        sums = [0.0] * len(codes)
+        for code, score in zip(pair_sector, pair_score):
+            counts[code] += 1
+            sums[code] += score
     harvest['sector_sentiment'] = {}
-    for sector, data in sector_scores.items():
-        if data['scores']:
-            avg = sum(data['scores']) / len(data['scores'])
-            harvest['sector_sentiment'][sector] = {
-                'score': round(avg, 3),
-                'count': len(data['scores']),
-                'signal': 'BUY' if avg > 0.25 else ('SELL' if avg < -0.25 else 'HOLD')
-            }
+    for sector, count, total in zip(codes, counts, sums):
+        avg = total / count
+        harvest['sector_sentiment'][sector] = {
+            'score': round(avg, 3),
+            'count': count,
+            'signal': 'BUY' if avg > 0.25 else ('SELL' if avg < -0.25 else 'HOLD')
+        }
     
     harvest['llm_analyzed'] = True
     harvest['llm_updated'] = datetime.now().isoformat()
@@ -12,19 +12,42 @@ Phases:
 6. Self-Evaluation - Report what was learned
 """
 
+import asyncio
 import json
 import os
 import sys
 import time
-import urllib.request
 import re
+import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+from urllib.parse import urlparse
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 OLLAMA_URL = "http://localhost:11434/api/generate"
 
+# From the first '{' to the last '}' of an Ollama answer
+JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
+
+# Headline counters for source probing; headings must open and close on one line
+HEADING_RE = re.compile(r'<h[123][^>]*>.*?</h[123]>', re.IGNORECASE)
+ARTICLE_RE = re.compile(r'<article[^>]*>.*?</article>', re.IGNORECASE | re.DOTALL)
+PROBE_BYTES = 65536  # Page prefix read per probe; plenty to see more than 5 headlines
+PROBE_CONCURRENCY = 8  # Candidate sources probed at once, across all hosts
+PROBE_DELAY = 1.0  # Seconds before each probe of a host (be polite)
+
+# Profile generations in flight on the nightly Ollama box. Replaces the old 2 s sleep
+# between tickers: two keep llama3.1:8b busy without starving the other nightly phases.
+EMBEDDING_CONCURRENCY = 2
+
+# One keep-alive connection to Ollama for the whole night
+_OLLAMA_SESSION = requests.Session()
+
+# Keep-alive connections for probing candidate news sources
+_FETCH_SESSION = requests.Session()
+_FETCH_SESSION.headers["User-Agent"] = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)"
+
 # Learning log
 LEARNING_LOG = os.path.join(DATA_DIR, "nightly_learning_log.jsonl")
 
@@ -79,16 +102,14 @@ def save_json(path: str, data: dict):
 def ollama_generate(prompt: str, model: str = "llama3.2:3b", timeout: int = 60) -> Optional[str]:
     """Generate text with Ollama."""
     try:
-        payload = json.dumps({
+        response = _OLLAMA_SESSION.post(OLLAMA_URL, json={
             "model": model,
             "prompt": prompt,
             "stream": False,
             "options": {"temperature": 0.3, "num_predict": 1000}
-        }).encode("utf-8")
-        req = urllib.request.Request(OLLAMA_URL, data=payload, 
-                                      headers={"Content-Type": "application/json"})
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode("utf-8")).get("response", "")
+        }, timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("response", "")
     except Exception as e:
         print(f"    Ollama error: {e}")
         return None
@@ -124,15 +145,20 @@ def test_news_source(url: str, timeout: int = 10) -> dict:
     """Test if a news source is accessible and has useful content."""
     result = {"accessible": False, "has_content": False, "headlines": 0}
     try:
-        req = urllib.request.Request(url, headers={
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)"
-        })
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            html = resp.read().decode("utf-8", errors="ignore")
+        # Range is only a hint; servers that ignore it are cut off after PROBE_BYTES anyway
+        with _FETCH_SESSION.get(url, timeout=timeout, stream=True,
+                                headers={"Range": f"bytes=0-{PROBE_BYTES - 1}"}) as resp:
+            resp.raise_for_status()
+            body = bytearray()
+            for chunk in resp.iter_content(chunk_size=16384):
+                body += chunk
+                if len(body) >= PROBE_BYTES:
+                    break
+            html = body[:PROBE_BYTES].decode("utf-8", errors="ignore")
             result["accessible"] = True
             # Count potential headlines (h1, h2, h3, article titles)
-            headlines = len(re.findall(r'<h[123][^>]*>.*?</h[123]>', html, re.IGNORECASE))
-            headlines += len(re.findall(r'<article[^>]*>.*?</article>', html[:50000], re.IGNORECASE | re.DOTALL))
+            headlines = len(HEADING_RE.findall(html))
+            headlines += len(ARTICLE_RE.findall(html, 0, 50000))
             result["headlines"] = headlines
             result["has_content"] = headlines > 5
     except Exception as e:
@@ -140,6 +166,28 @@ def test_news_source(url: str, timeout: int = 10) -> dict:
     return result
 
 
+async def test_news_sources_async(sources: List[dict], deadline: float) -> List[Optional[dict]]:
+    """
+    Probe sources concurrently: at most PROBE_CONCURRENCY at once and one request
+    at a time per host, PROBE_DELAY apart. A source whose turn comes after the
+    deadline gets None.
+    """
+    host_locks = {}
+    semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+    
+    async def probe(source):
+        lock = host_locks.setdefault(urlparse(source["url"]).netloc, asyncio.Semaphore(1))
+        async with lock:
+            await asyncio.sleep(PROBE_DELAY)
+            async with semaphore:
+                if time.time() > deadline:
+                    return None
+                print(f"  Testing: {source['name']}...")
+                return await asyncio.to_thread(test_news_source, source["url"])
+    
+    return await asyncio.gather(*(probe(source) for source in sources))
+
+
 def discover_news_sources(time_limit: int = 3600) -> dict:
     """Find and test new news sources."""
     print("\n=== PHASE 1: News Source Discovery ===")
@@ -156,17 +204,17 @@ def discover_news_sources(time_limit: int = 3600) -> dict:
     new_sources = []
     tested = 0
     
-    for source in POTENTIAL_NEWS_SOURCES:
-        if time.time() - start > time_limit:
-            print(f"  Time limit reached after {tested} tests")
-            break
-            
-        url = source["url"]
-        if url in existing_urls or url in tested_urls:
+    candidates = [source for source in POTENTIAL_NEWS_SOURCES
+                  if source["url"] not in existing_urls and source["url"] not in tested_urls]
+    results = asyncio.run(test_news_sources_async(candidates, start + time_limit))
+    if None in results:
+        print(f"  Time limit reached after {len(results) - results.count(None)} tests")
+    
+    for source, result in zip(candidates, results):
+        if result is None:
             continue
-            
-        print(f"  Testing: {source['name']}...")
-        result = test_news_source(url)
+        
+        url = source["url"]
         tested += 1
         existing["tested"].append(url)
         
@@ -183,8 +231,6 @@ def discover_news_sources(time_limit: int = 3600) -> dict:
             log_learning("news_discovery", "source_failed", {
                 "name": source["name"], "url": url, "error": result.get("error", "no content")
             })
-        
-        time.sleep(1)  # Be polite
     
     existing["last_discovery"] = datetime.now().isoformat()
     save_json(NEWS_SOURCES_FILE, existing)
@@ -231,7 +277,7 @@ Return ONLY valid JSON:
         return None
     
     # Parse JSON from response
-    match = re.search(r'\{[\s\S]*\}', response)
+    match = JSON_OBJECT_RE.search(response)
     if match:
         try:
             data = json.loads(match.group())
@@ -242,6 +288,24 @@ Return ONLY valid JSON:
     return None
 
 
+async def fetch_company_embeddings_async(tickers: List[str], deadline: float,
+                                         max_concurrent: int = EMBEDDING_CONCURRENCY) -> List[Optional[dict]]:
+    """
+    Profiles for tickers, max_concurrent Ollama requests at a time, in input order;
+    None for a failed ticker, or False for one whose turn came after the deadline.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+    
+    async def fetch(ticker):
+        async with semaphore:
+            if time.time() > deadline:
+                return False
+            print(f"  Fetching: {ticker}...")
+            return await asyncio.to_thread(fetch_company_embedding, ticker)
+    
+    return await asyncio.gather(*(fetch(ticker) for ticker in tickers))
+
+
 def expand_embeddings(time_limit: int = 5400) -> dict:
     """Expand company embeddings for all assets."""
     print("\n=== PHASE 2: Embedding Expansion ===")
@@ -268,13 +332,11 @@ def expand_embeddings(time_limit: int = 5400) -> dict:
     added = 0
     refreshed = 0
     
-    for ticker in to_process:
-        if time.time() - start > time_limit:
-            print(f"  Time limit reached after processing {added + refreshed} embeddings")
-            break
-        
-        print(f"  Fetching: {ticker}...")
-        embedding = fetch_company_embedding(ticker)
+    results = asyncio.run(fetch_company_embeddings_async(to_process, start + time_limit))
+    
+    for ticker, embedding in zip(to_process, results):
+        if embedding is False:
+            continue
         
         if embedding:
             was_new = ticker not in existing
@@ -288,8 +350,9 @@ def expand_embeddings(time_limit: int = 5400) -> dict:
             })
         else:
             log_learning("embedding_expansion", "embedding_failed", {"ticker": ticker})
-        
-        time.sleep(2)  # Don't overload Ollama
+    
+    if False in results:
+        print(f"  Time limit reached after processing {added + refreshed} embeddings")
     
     embeddings["last_expansion"] = datetime.now().isoformat()
     save_json(EMBEDDINGS_FILE, embeddings)
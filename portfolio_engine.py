@@ -13,6 +13,8 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+from daily_learning import append_learning_history
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 class PortfolioEngine:
@@ -83,9 +85,6 @@ class PortfolioEngine:
                     'win_rate': None
                 } for scenario in self.config['scenarios']
             },
-            
-            # Learning log
-            'learning_history': []
         }
         
         self._save_model(model)
@@ -385,8 +384,10 @@ class PortfolioEngine:
                 sens['sentiment_multiplier'] = max(0.5, sens['sentiment_multiplier'] * 0.95)
                 learning_entry['adjustments'].append(f"{sector}: ✗ wrong, multiplier -5%")
         
-        self.model['learning_history'].append(learning_entry)
+        # Move any inline history to the log, but only once the model without it is saved
+        history_entries = self.model.pop('learning_history', []) + [learning_entry]
         self._save_model()
+        append_learning_history(history_entries)
         
         return learning_entry
 